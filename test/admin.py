@@ -1,143 +1,106 @@
 # Admin dashboard (ASCII only, UTF-8)
-from fastapi import APIRouter, Request
-from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse
+import gzip
+import hashlib
+import os
+import re
+import secrets
+from functools import lru_cache
+from hmac import compare_digest
+from pathlib import Path
+from typing import NamedTuple
+
+import orjson
+from fastapi import APIRouter, Request, Response
+from fastapi.responses import HTMLResponse, RedirectResponse
+from pydantic import BaseModel, ConfigDict, ValidationError
+from starlette.concurrency import run_in_threadpool
 
 try:
+    import brotli
+except ImportError:  # optional dependency, gzip is always available
+    brotli = None
+
+# Resolve sibling modules once: package-relative when imported as a package,
+# top-level when started from the test folder
+if __package__:
+    from .auth import ADMIN_KEY_ENV
     from .metrics import get_totals
+    from .responses import ORJSONResponse
+    from .sessions import create_session_store
     from .proxy import (
+        add_allowed_domain,
         allowed_domains,
+        get_allowed_version,
+        remove_allowed_domain,
+    )
+    from .rate_limit import (
         get_rate_limit_config,
-        update_rate_limit_config,
         get_window_usage,
+        update_rate_limit_config,
     )
-except ImportError:
+else:
+    from auth import ADMIN_KEY_ENV # type: ignore
     from metrics import get_totals # type: ignore
+    from responses import ORJSONResponse # type: ignore
+    from sessions import create_session_store # type: ignore
     from proxy import ( # type: ignore
+        add_allowed_domain,
         allowed_domains,
+        get_allowed_version,
+        remove_allowed_domain,
+    )
+    from rate_limit import ( # type: ignore
         get_rate_limit_config,
-        update_rate_limit_config,
         get_window_usage,
+        update_rate_limit_config,
     )
 
-router = APIRouter()
-ADMIN_PASSWORD = "zqqzqq" # Fixed password
+# Internal UI endpoints; kept out of the OpenAPI schema
+router = APIRouter(include_in_schema=False)
+ADMIN_PASSWORD = "zqqzqq" # Fixed password, used when ADMIN_API_KEY is unset
+_AUTH_MODE = "env" if os.getenv(ADMIN_KEY_ENV) else "fixed"
+_EXPECTED_KEY = os.getenv(ADMIN_KEY_ENV) if _AUTH_MODE == "env" else ADMIN_PASSWORD
+_PASSWORD_HINT = (
+    f"固定密码: <code>{ADMIN_PASSWORD}</code>" if _AUTH_MODE == "fixed" else ""
+)
 SESSION_KEY = "admin_session_key"
-_active_sessions = set()
+SESSION_MAX_AGE = 3600
+MAX_SESSIONS = 1024
+# Redis when ADMIN_SESSION_REDIS_URL is set (and redis is installed), else in-process
+# Keyed by SHA-256 of the random cookie token, never by the token itself
+_active_sessions = create_session_store(MAX_SESSIONS)
+STATIC_DIR = Path(__file__).parent / "static"
 
 
-def _get_expected_key() -> str:
-    return ADMIN_PASSWORD
-
-
-def _has_valid_session(request: Request) -> bool:
-    token = request.cookies.get(SESSION_KEY)
-    return bool(token and token in _active_sessions)
+def _asset_url(name: str) -> str:
+    # Content-hashed URL so static assets can be cached as immutable
+    try:
+        digest = hashlib.blake2s(
+            (STATIC_DIR / name).read_bytes(), digest_size=6
+        ).hexdigest()
+    except OSError:
+        return f"/static/{name}"
+    return f"/static/{name}?v={digest}"
 
 
-@router.get("/admin/login", response_class=HTMLResponse)
-async def admin_login_page():
-    html = """<!DOCTYPE html><html lang='zh-CN'><head><meta charset='utf-8'><title>登录后台</title>
-<style>body{font-family:Arial,sans-serif;background:#f5f7fa;padding:40px;color:#333}form{max-width:340px;margin:0 auto;background:#fff;padding:22px26px;border-radius:10px;box-shadow:02px6px rgba(0,0,0,.08);display:flex;flex-direction:column;gap:14px}h1{font-size:22px;margin:004px}input{padding:10px12px;border:1px solid #d1d5db;border-radius:6px;font-size:14px}button{padding:10px12px;background:#2563eb;color:#fff;border:none;border-radius:6px;cursor:pointer;font-size:14px}button:hover{background:#1d4ed8}.msg{min-height:18px;font-size:13px}.err{color:#c0392b}.ok{color:#2e7d32}.footer{margin-top:30px;font-size:11px;color:#777;text-align:center}</style></head><body>
+_LOGIN_HTML = f"""<!DOCTYPE html><html lang='zh-CN'><head>
+<meta charset='utf-8'><title>登录后台</title>
+<link rel='stylesheet' href='{_asset_url("login.css")}'></head><body>
 <form id='loginForm'>
     <h1>管理员登录</h1>
-    <p style='font-size:12px;color:#555;margin:0'>请输入后台密码以访问管理界面。固定密码: <code>zqqzqq</code></p>
+    <p style='font-size:12px;color:#555;margin:0'>
+    请输入后台密码以访问管理界面。{_PASSWORD_HINT}</p>
     <input id='apiKeyInput' type='password' placeholder='密码'>
     <button type='submit'>登录</button>
     <div id='msg' class='msg'></div>
 </form>
 <div class='footer'>Py-Proxy ©2024</div>
-<script>
-async function doLogin(e){e.preventDefault();const k=document.getElementById('apiKeyInput').value.trim();if(!k){setMsg('请输入密码','err');return;}const r=await fetch('/admin/login',{method:'POST',headers:{'Content-Type':'application/json'},body:JSON.stringify({key:k})});if(r.status===200){setMsg('登录成功','ok');setTimeout(()=>{location.href='/admin';},400);}else{setMsg('登录失败 ('+r.status+')','err');}}
-function setMsg(t,c){const el=document.getElementById('msg');el.className='msg '+(c||'');el.textContent=t;}
-document.getElementById('loginForm').addEventListener('submit',doLogin);
-</script></body></html>"""
-    return HTMLResponse(content=html, status_code=200)
-
-
-@router.post("/admin/login")
-async def admin_login(request: Request):
-    expected = _get_expected_key()
-    data = await request.json()
-    provided = (data.get("key") or "").strip()
-    if provided != expected:
-        return JSONResponse({"detail": "Invalid password"}, status_code=401)
-    _active_sessions.add(provided)
-    resp = JSONResponse({"detail": "ok"})
-    resp.set_cookie(
-        SESSION_KEY,
-        provided,
-        httponly=True,
-        secure=False,
-        max_age=3600,
-        samesite="Lax",
-    )
-    return resp
-
-
-@router.get("/admin/rate_limit")
-async def admin_get_rate_limit():
-    cfg = get_rate_limit_config()
-    usage = get_window_usage()
-    return {"config": cfg, "usage": usage}
-
-
-@router.post("/admin/rate_limit/update")
-async def admin_update_rate_limit(request: Request):
-    data = await request.json()
-    kwargs = {}
-    for key in (
-        "enabled",
-        "window_seconds",
-        "max_requests_per_ip",
-        "max_requests_per_domain",
-    ):
-        if key in data:
-            kwargs[key] = data[key]
-    cfg = update_rate_limit_config(**kwargs)
-    usage = get_window_usage()
-    return {"config": cfg, "usage": usage}
-
-
-@router.post('/admin/domains/add')
-async def admin_add_domain(request: Request):
-    if not _has_valid_session(request):
-        return JSONResponse({'detail': 'Not authenticated'}, status_code=401)
-    data = await request.json()
-    pattern = (data.get('d') or '').strip()
-    try:
-        from .proxy import add_allowed_domain
-    except ImportError:
-        from proxy import add_allowed_domain # type: ignore
-    ok = add_allowed_domain(pattern)
-    return JSONResponse({'ok': ok, 'domains': allowed_domains})
-
-
-@router.post('/admin/domains/remove')
-async def admin_remove_domain(request: Request):
-    if not _has_valid_session(request):
-        return JSONResponse({'detail': 'Not authenticated'}, status_code=401)
-    data = await request.json()
-    pattern = (data.get('d') or '').strip()
-    try:
-        from .proxy import remove_allowed_domain
-    except ImportError:
-        from proxy import remove_allowed_domain # type: ignore
-    ok = remove_allowed_domain(pattern)
-    return JSONResponse({'ok': ok, 'domains': allowed_domains})
-
-
-@router.get("/admin", response_class=HTMLResponse)
-async def admin_page(request: Request):
-    if not _has_valid_session(request):
-        return RedirectResponse("/admin/login", status_code=302)
-
-    allowed_html = (
-        "".join(f"<li><code>{d}</code></li>" for d in allowed_domains)
-        or "<li><em>未配置 (默认全允许)</em></li>"
-    )
+<script src='{_asset_url("login.js")}' defer></script>
+</body></html>"""
 
-    html = """<!DOCTYPE html><html lang='zh-CN'><head><meta charset='utf-8'><title>管理后台</title>
-<style>body{font-family:Arial,sans-serif;background:#f5f7fa;padding:28px;color:#333}h1{margin:0018px}.grid{display:grid;grid-template-columns:repeat(auto-fill,minmax(340px,1fr));gap:20px}.card{background:#fff;border:1px solid #e1e4e8;border-radius:10px;padding:18px;box-shadow:02px4px rgba(0,0,0,.05)}table{width:100%;border-collapse:collapse;font-size:13px}th,td{border:1px solid #e1e4e8;padding:6px8px;text-align:left}th{background:#f1f5f9}.footer{margin-top:40px;font-size:12px;color:#777;text-align:center}code{background:#f1f5f9;padding:2px4px;border-radius:4px}button.logout{padding:6px10px;border:none;border-radius:6px;background:#ef4444;color:#fff;cursor:pointer;margin-top:16px}button.logout:hover{background:#dc2626}.muted{color:#666;font-size:12px;margin-top:4px}</style></head><body>
+_ADMIN_PAGE_TEMPLATE = f"""<!DOCTYPE html><html lang='zh-CN'><head>
+<meta charset='utf-8'><title>管理后台</title>
+<link rel='stylesheet' href='{_asset_url("admin.css")}'></head><body>
 <h1>Py-Proxy 管理后台</h1>
 <div class='grid'>
  <div class='card'>
@@ -145,7 +108,9 @@ async def admin_page(request: Request):
  <div id='totals'>加载中...</div>
  <div id='rates' class='muted'>速率: 加载中...</div>
  <div class='muted' id='uptime'></div>
- <canvas id='rateChart' width='360' height='120' style='margin-top:8px;border:1px solid #e1e4e8;border-radius:6px;background:#fafafa'></canvas>
+ <canvas id='rateChart' width='360' height='120'
+  style='margin-top:8px;border:1px solid #e1e4e8;border-radius:6px;background:#fafafa'>
+ </canvas>
  </div>
  <div class='card'>
  <h2>域名统计</h2>
@@ -180,49 +145,281 @@ async def admin_page(request: Request):
  <button type='submit' class='logout'>退出登录</button>
 </form>
 <div class='footer'>Py-Proxy ©2024</div>
-<script>
-const chartData={up:[],down:[]};
-function appendRate(up_bps,down_bps){const upKB=up_bps/1024,downKB=down_bps/1024;chartData.up.push(upKB);chartData.down.push(downKB);if(chartData.up.length>60){chartData.up.shift();chartData.down.shift();}drawRate();}
-function drawRate(){const c=document.getElementById('rateChart');if(!c)return;const ctx=c.getContext('2d');const W=c.width,H=c.height;ctx.clearRect(0,0,W,H);ctx.font='10px Arial';ctx.fillStyle='#555';ctx.fillText('上行(KB/s)',6,12);ctx.fillText('下行(KB/s)',6,24);const max=Math.max(...chartData.up,...chartData.down,1);const pad=30;function line(arr,color){ctx.beginPath();ctx.strokeStyle=color;arr.forEach((v,i)=>{const x=pad+(W-pad-5)*(i/(arr.length-1||1));const y=H-10-(H-pad-10)*(v/max);i?ctx.lineTo(x,y):ctx.moveTo(x,y);});ctx.stroke();}
-ctx.strokeStyle='#eee';for(let i=0;i<5;i++){const y=H-10-(H-pad-10)*(i/4);ctx.beginPath();ctx.moveTo(pad,y);ctx.lineTo(W-5,y);ctx.stroke();}
-line(chartData.up,'#2563eb');line(chartData.down,'#16a34a');ctx.fillStyle='#333';ctx.fillText('max '+max.toFixed(1)+' KB/s',W-100,12);}
-function fmtBytes(b){if(!b)return'0 B';const k=1024,s=['B','KB','MB','GB','TB'];const i=Math.floor(Math.log(b)/Math.log(k));const v=b/Math.pow(k,i);return v.toFixed(v>=100?0:v>=10?1:2)+' '+s[i];}
-function fmtKBps(bps){return (bps/1024).toFixed(bps>=102400?0:bps>=10240?1:2)+' KB/s';}
-function loadMetrics(){fetch('/metrics/traffic').then(r=>r.json()).then(m=>{document.getElementById('totals').innerHTML='上行: <strong>'+fmtBytes(m.total_up_bytes)+'</strong><br>下行: <strong>'+fmtBytes(m.total_down_bytes)+'</strong><br>总计: <strong>'+fmtBytes(m.total_bytes)+'</strong><br>请求数: <strong>'+m.total_requests+'</strong>';document.getElementById('rates').innerHTML='上行速率: '+fmtKBps(m.rates.up_bps)+' | 下行速率: '+fmtKBps(m.rates.down_bps)+' (窗口 '+m.window_seconds+'s)';document.getElementById('uptime').innerHTML='运行时间: '+Math.floor(m.uptime_seconds)+' 秒';appendRate(m.rates.up_bps,m.rates.down_bps);const tbody=document.querySelector('#domainTable tbody');const entries=Object.entries(m.domain_stats);if(!entries.length){tbody.innerHTML='<tr><td colspan=\"5\"><em>暂无数据</em></td></tr>';return;}tbody.innerHTML=entries.map(([d,st])=>'<tr><td>'+d+'</td><td>'+st.requests+'</td><td>'+fmtBytes(st.up_bytes)+'</td><td>'+fmtBytes(st.down_bytes)+'</td><td>'+fmtBytes(st.up_bytes+st.down_bytes)+'</td></tr>').join('');});}
-async function loadRateLimit(){const r = await fetch('/admin/rate_limit');if(!r.ok){document.getElementById('rateLimitPanel').innerHTML='<em>无法获取</em>';return;}const data = await r.json();const c = data.config; const u = data.usage;document.getElementById('rl_enabled').checked = !!c.enabled;document.getElementById('rl_window').value = c.window_seconds;document.getElementById('rl_ip').value = c.max_requests_per_ip || '';document.getElementById('rl_dom').value = c.max_requests_per_domain || '';let html = '<div>状态: '+(c.enabled?'启用':'关闭')+'</div>';if(c.enabled){html += '<div>窗口: '+c.window_seconds+'s 剩余: '+(u.reset_epoch - Math.floor(Date.now()/1000))+'s</div>';}document.getElementById('rateLimitPanel').innerHTML = html;}
-function refreshAllowed(list){const ul=document.querySelector('ul');ul.innerHTML=list.map(d=>'<li><code>'+d+'</code></li>').join('')||'<li><em>未配置</em></li>'}
-async function addDomain(){const v=document.getElementById('domainInput').value.trim();if(!v)return;const r=await fetch('/admin/domains/add',{method:'POST',headers:{'Content-Type':'application/json'},body:JSON.stringify({d:v})});if(r.ok){const data=await r.json();refreshAllowed(data.domains);document.getElementById('domainInput').value='';}}
-async function delDomain(){const v=document.getElementById('domainInput').value.trim();if(!v)return;const r=await fetch('/admin/domains/remove',{method:'POST',headers:{'Content-Type':'application/json'},body:JSON.stringify({d:v})});if(r.ok){const data=await r.json();refreshAllowed(data.domains);document.getElementById('domainInput').value='';}}
-loadMetrics();setInterval(loadMetrics,2000);
-loadRateLimit();setInterval(loadRateLimit,5000);
-// Bind buttons after DOM ready
-setTimeout(()=>{const a=document.getElementById('addDomainBtn');const d=document.getElementById('delDomainBtn');a&& (a.onclick=addDomain);d&& (d.onclick=delDomain);},0);
-</script>
+<script src='{_asset_url("admin.js")}' defer></script>
 </body></html>"""
 
-    html = html.replace("__ALLOWED__", allowed_html)
-    return HTMLResponse(content=html, status_code=200)
+
+def _compile_template(src: str) -> tuple[bytes | str, ...]:
+    # Split once on __NAME__ markers: UTF-8 literals at even indices, slot names
+    # at odd ones, so rendering only encodes the substituted values
+    parts: list[bytes | str] = re.split(r"__([A-Z][A-Z_]*)__", src)
+    parts[::2] = [part.encode("utf-8") for part in parts[::2]]
+    return tuple(parts)
+
+
+def _render_template(template: tuple[bytes | str, ...], **values: str) -> bytes:
+    parts = list(template)
+    parts[1::2] = [values[name].encode("utf-8") for name in template[1::2]]
+    return b"".join(parts)
+
+
+_ADMIN_PAGE = _compile_template(_ADMIN_PAGE_TEMPLATE)
+
+
+class _EncodedPage(NamedTuple):
+    etag: str
+    bodies: dict[str, bytes]  # content-encoding -> payload
+
+
+def _encode_page(body: bytes) -> _EncodedPage:
+    bodies = {"identity": body, "gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        bodies["br"] = brotli.compress(body, quality=11)
+    # Weak validator: the same tag covers every content-encoding of the page
+    etag = f'W/"{hashlib.blake2s(body, digest_size=8).hexdigest()}"'
+    return _EncodedPage(etag, bodies)
+
+
+@lru_cache(maxsize=64)
+def _accepted_encodings(header: str) -> frozenset:
+    # Coding names from Accept-Encoding, minus any explicitly refused with q=0
+    accepted = set()
+    for item in header.lower().split(","):
+        coding, _, params = item.partition(";")
+        q = params.strip().removeprefix("q=").strip()
+        try:
+            if q and float(q) <= 0:
+                continue
+        except ValueError:
+            pass
+        accepted.add(coding.strip())
+    return frozenset(accepted)
+
+
+def _etag_matches(etag: str, header: str) -> bool:
+    # If-None-Match uses weak comparison: compare whole tags, ignoring W/
+    if not header:
+        return False
+    opaque = etag.removeprefix("W/")
+    for item in header.split(","):
+        tag = item.strip()
+        if tag == "*" or tag.removeprefix("W/") == opaque:
+            return True
+    return False
+
+
+def _page_response(request: Request, page: _EncodedPage) -> Response:
+    headers = {
+        "ETag": page.etag,
+        "Cache-Control": "private, max-age=0, must-revalidate",
+        "Vary": "Accept-Encoding",
+    }
+    if _etag_matches(page.etag, request.headers.get("if-none-match", "")):
+        return Response(status_code=304, headers=headers)
+    accept = _accepted_encodings(request.headers.get("accept-encoding", ""))
+    for encoding in ("br", "gzip"):
+        if encoding in page.bodies and encoding in accept:
+            headers["Content-Encoding"] = encoding
+            return Response(
+                content=page.bodies[encoding], media_type="text/html", headers=headers
+            )
+    return Response(
+        content=page.bodies["identity"], media_type="text/html", headers=headers
+    )
+
+
+_LOGIN_PAGE = _encode_page(_LOGIN_HTML.encode("utf-8"))
+_HTML_ESCAPE = str.maketrans(
+    {"&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;", "'": "&#39;"}
+)
+_EMPTY_LI = "<li><em>未配置 (默认全允许)</em></li>"
+
+
+def _build_allowed_html(domains: list[str]) -> str:
+    return "".join(
+        [f"<li><code>{d.translate(_HTML_ESCAPE)}</code></li>" for d in domains]
+    )
+
+
+def _render_admin_page(domains: list[str]) -> _EncodedPage:
+    allowed_html = _build_allowed_html(domains) if domains else _EMPTY_LI
+    return _encode_page(_render_template(_ADMIN_PAGE, ALLOWED=allowed_html))
+
+
+# (allowed version, encoded page) for the last rendered dashboard; the
+# env-configured list is rendered at import so the first visit is a cache hit
+_admin_page_cache: tuple[int, _EncodedPage] = (
+    get_allowed_version(),
+    _render_admin_page(allowed_domains),
+)
+
+
+class LoginBody(BaseModel):
+    model_config = ConfigDict(str_strip_whitespace=True)
+
+    key: str = ""
+
+
+class DomainBody(BaseModel):
+    model_config = ConfigDict(str_strip_whitespace=True)
+
+    d: str = ""
+
+
+async def _read_domain_body(request: Request) -> DomainBody | None:
+    try:
+        return DomainBody.model_validate_json(await request.body())
+    except ValidationError:
+        return None
+
+
+def _get_expected_key() -> str:
+    return _EXPECTED_KEY
+
+
+def _token_hash(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+async def _has_valid_session(request: Request) -> bool:
+    token = request.cookies.get(SESSION_KEY)
+    return bool(token and await _active_sessions.exists(_token_hash(token)))
+
+
+@router.get("/admin/login", response_class=HTMLResponse)
+async def admin_login_page(request: Request):
+    return _page_response(request, _LOGIN_PAGE)
+
+
+@router.post("/admin/login")
+async def admin_login(body: LoginBody):
+    expected = _get_expected_key()
+    provided = body.key
+    if not compare_digest(provided.encode(), expected.encode()):
+        return ORJSONResponse({"detail": "Invalid password"}, status_code=401)
+    token = secrets.token_urlsafe(32)
+    await _active_sessions.add(_token_hash(token), SESSION_MAX_AGE)
+    resp = ORJSONResponse({"detail": "ok"})
+    resp.set_cookie(
+        SESSION_KEY,
+        token,
+        httponly=True,
+        secure=False,
+        max_age=SESSION_MAX_AGE,
+        samesite="Lax",
+    )
+    return resp
+
+
+# Accepted fields and their exact JSON types (bool is not accepted as an int)
+_RATE_LIMIT_FIELDS = {
+    "enabled": (bool,),
+    "window_seconds": (int,),
+    "max_requests_per_ip": (int, type(None)),
+    "max_requests_per_domain": (int, type(None)),
+}
+
+
+@router.get("/admin/rate_limit", response_class=ORJSONResponse)
+async def admin_get_rate_limit(request: Request):
+    if not await _has_valid_session(request):
+        return ORJSONResponse({"detail": "Not authenticated"}, status_code=401)
+    cfg = await get_rate_limit_config()
+    usage = await get_window_usage()
+    return ORJSONResponse({"config": cfg, "usage": usage})
+
+
+@router.post("/admin/rate_limit/update", response_class=ORJSONResponse)
+async def admin_update_rate_limit(request: Request):
+    if not await _has_valid_session(request):
+        return ORJSONResponse({"detail": "Not authenticated"}, status_code=401)
+    try:
+        data = orjson.loads(await request.body())
+    except orjson.JSONDecodeError:
+        return ORJSONResponse({"detail": "Invalid JSON body"}, status_code=400)
+    if not isinstance(data, dict):
+        data = {}
+    kwargs = {
+        key: data[key]
+        for key in _RATE_LIMIT_FIELDS.keys() & data.keys()
+        if type(data[key]) in _RATE_LIMIT_FIELDS[key]
+    }
+    cfg = await update_rate_limit_config(**kwargs)
+    usage = await get_window_usage()
+    return ORJSONResponse({"config": cfg, "usage": usage})
+
+
+@router.post('/admin/domains/add')
+async def admin_add_domain(request: Request):
+    # The body is read by hand so the session check comes first
+    if not await _has_valid_session(request):
+        return ORJSONResponse({'detail': 'Not authenticated'}, status_code=401)
+    body = await _read_domain_body(request)
+    if body is None:
+        return ORJSONResponse({'detail': 'Invalid body'}, status_code=400)
+    ok = add_allowed_domain(body.d)
+    return ORJSONResponse({'ok': ok, 'domains': allowed_domains})
+
+
+@router.post('/admin/domains/remove')
+async def admin_remove_domain(request: Request):
+    if not await _has_valid_session(request):
+        return ORJSONResponse({'detail': 'Not authenticated'}, status_code=401)
+    body = await _read_domain_body(request)
+    if body is None:
+        return ORJSONResponse({'detail': 'Invalid body'}, status_code=400)
+    ok = remove_allowed_domain(body.d)
+    return ORJSONResponse({'ok': ok, 'domains': allowed_domains})
+
+
+@router.get("/admin", response_class=HTMLResponse)
+async def admin_page(request: Request):
+    global _admin_page_cache  # noqa: PLW0603
+    if not await _has_valid_session(request):
+        return RedirectResponse("/admin/login", status_code=302)
+
+    version = get_allowed_version()
+    if _admin_page_cache[0] != version:
+        # gzip-9/brotli-11 take milliseconds; keep them off the event loop
+        page = await run_in_threadpool(_render_admin_page, list(allowed_domains))
+        _admin_page_cache = (version, page)
+    return _page_response(request, _admin_page_cache[1])
 
 
 @router.post("/admin/logout")
 async def admin_logout(request: Request):
     token = request.cookies.get(SESSION_KEY)
-    if token and token in _active_sessions:
-        _active_sessions.discard(token)
+    if token:
+        await _active_sessions.discard(_token_hash(token))
     resp = RedirectResponse("/admin/login", status_code=302)
     resp.delete_cookie(SESSION_KEY)
     return resp
 
 
+@router.get("/admin/bootstrap", response_class=ORJSONResponse)
+async def admin_bootstrap(request: Request):
+    if not await _has_valid_session(request):
+        return ORJSONResponse({"detail": "Not authenticated"}, status_code=401)
+    totals = await get_totals()
+    return ORJSONResponse({
+        "traffic": totals,
+        "rate_limit": {
+            "config": await get_rate_limit_config(),
+            "usage": await get_window_usage(),
+        },
+        "allowed_domains": allowed_domains,
+    })
+
+
 @router.get("/admin/data")
 async def admin_data(request: Request):
-    if not _has_valid_session(request):
-        return JSONResponse({"detail": "Not authenticated"}, status_code=401)
+    if not await _has_valid_session(request):
+        return ORJSONResponse({"detail": "Not authenticated"}, status_code=401)
     totals = await get_totals()
-    return JSONResponse(
+    return ORJSONResponse(
         {
             "allowed_domains": allowed_domains,
             "traffic": totals,
-            "rate_limit": get_rate_limit_config(),
+            "rate_limit": await get_rate_limit_config(),
         }
     )
@@ -1,16 +1,26 @@
 import os
+from functools import lru_cache
+from hmac import compare_digest
+from typing import Optional
+
 from fastapi import Header, HTTPException, status
 
 ADMIN_KEY_ENV = "ADMIN_API_KEY"
 
+
+@lru_cache(maxsize=1)
+def _get_expected_key() -> Optional[str]:
+    return os.getenv(ADMIN_KEY_ENV) or None
+
+
 async def require_admin(x_api_key: str = Header(None)):
-    expected = os.getenv(ADMIN_KEY_ENV)
+    expected = _get_expected_key()
     if not expected:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Admin API key not configured (set ADMIN_API_KEY environment variable).",
         )
-    if not x_api_key or x_api_key != expected:
+    if not x_api_key or not compare_digest(x_api_key.encode(), expected.encode()):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid or missing X-API-Key header.",
@@ -1,49 +1,69 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.responses import HTMLResponse
 from fastapi.staticfiles import StaticFiles
-import os
 import logging
+import sys
 from pathlib import Path
 
-# Robust import handling (supports running as package or script)
-try:
+# Resolve sibling modules once: package-relative when imported as a package,
+# top-level when started as a script or from the test folder
+if __package__:
+    from .proxy import close_http_client, get_http_client
     from .proxy import router as proxy_router
     from .metrics import router as metrics_router
     from .admin import router as admin_router
-except ImportError:
-    try:
-        from proxy import router as proxy_router  # type: ignore
-        from metrics import router as metrics_router  # type: ignore
-        from admin import router as admin_router  # type: ignore
-    except ImportError:
-        import sys
-        current_dir = Path(__file__).parent
-        if str(current_dir) not in sys.path:
-            sys.path.append(str(current_dir))
-        import proxy  # type: ignore
-        import metrics  # type: ignore
-        import admin  # type: ignore
-        proxy_router = proxy.router
-        metrics_router = metrics.router
-        admin_router = admin.router
+    from .responses import ORJSONResponse
+else:
+    _here = str(Path(__file__).parent)
+    if _here not in sys.path:
+        sys.path.append(_here)
+    from proxy import close_http_client, get_http_client  # type: ignore
+    from proxy import router as proxy_router  # type: ignore
+    from metrics import router as metrics_router  # type: ignore
+    from admin import router as admin_router  # type: ignore
+    from responses import ORJSONResponse  # type: ignore
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Open the shared upstream client up front and release its pool on shutdown
+    app.state.http_client = get_http_client()
+    yield
+    await close_http_client()
+
+
 app = FastAPI(
     title="Py-Proxy",
     description="A FastAPI proxy application",
     version="0.1.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan,
 )
 
 BASE_DIR = Path(__file__).parent
 STATIC_DIR = BASE_DIR / "static"
 
+
+class CachedStaticFiles(StaticFiles):
+    # Admin pages reference css/js with a content hash, so those never change
+    IMMUTABLE_SUFFIXES = (".css", ".js")
+
+    def file_response(self, full_path, *args, **kwargs):
+        response = super().file_response(full_path, *args, **kwargs)
+        if str(full_path).endswith(self.IMMUTABLE_SUFFIXES):
+            response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        return response
+
+
 if STATIC_DIR.exists():
-    app.mount("/static", StaticFiles(directory=str(STATIC_DIR)), name="static")
-    logger.info(f"Static files mounted successfully at {STATIC_DIR}")
+    app.mount("/static", CachedStaticFiles(directory=str(STATIC_DIR)), name="static")
+    logger.info("Static files mounted successfully at %s", STATIC_DIR)
 else:
-    logger.warning(f"Static directory not found at {STATIC_DIR}, skipping static file serving")
+    logger.warning("Static directory not found at %s, skipping static file serving", STATIC_DIR)
 
 app.include_router(proxy_router)
 app.include_router(metrics_router)
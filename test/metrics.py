@@ -1,88 +1,107 @@
-import asyncio
 import time
-from collections import deque, defaultdict
-from typing import Dict, Deque, Tuple
+from collections import defaultdict
+from dataclasses import dataclass
 from fastapi import APIRouter
 
 router = APIRouter()
 
-# Global traffic counters protected by an asyncio lock
-_traffic_lock = asyncio.Lock()
+# Global traffic counters. Only touched from the event loop and never across an
+# await, so updates cannot interleave and need no lock
 _total_up_bytes: int =0
 _total_down_bytes: int =0
 _total_requests: int =0
-_start_time: float = time.time()
-_method_counts: Dict[str, int] = defaultdict(int)
-_domain_stats: Dict[str, Dict[str, int]] = defaultdict(lambda: {
- 'requests':0,
- 'up_bytes':0,
- 'down_bytes':0
-})
-# Recent activity for rate computation (timestamp, up, down)
-_recent: Deque[Tuple[float, int, int]] = deque()
+_start_time: float = time.monotonic() # uptime is immune to clock adjustments
+_method_counts: dict[str, int] = defaultdict(int)
+
+
+# Slotted so each tracked domain costs three attributes rather than a dict;
+# orjson serialises dataclasses natively, so JSON output keeps the same shape
+@dataclass(slots=True)
+class DomainStat:
+    requests: int =0
+    up_bytes: int =0
+    down_bytes: int =0
+
+
+_domain_stats: dict[str, DomainStat] = {}
 _MAX_WINDOW_SECONDS =60
+# Recent activity for rate computation: a ring of one-second buckets indexed by
+# second % window; a slot whose second is stale is reset before reuse. Seconds
+# come from time.monotonic() so clock adjustments cannot skew the window; an
+# empty slot holds a second that is always outside it, even shortly after boot
+_EMPTY_SEC = -_MAX_WINDOW_SECONDS -1
+_bucket_secs: list[int] = [_EMPTY_SEC] * _MAX_WINDOW_SECONDS
+_bucket_up: list[int] = [0] * _MAX_WINDOW_SECONDS
+_bucket_down: list[int] = [0] * _MAX_WINDOW_SECONDS
 
-async def add_up_bytes(n: int) -> None:
+def _current_bucket() -> int:
+    sec = int(time.monotonic())
+    idx = sec % _MAX_WINDOW_SECONDS
+    if _bucket_secs[idx] != sec:
+        _bucket_secs[idx] = sec
+        _bucket_up[idx] =0
+        _bucket_down[idx] =0
+    return idx
+
+def add_up_bytes(n: int) -> None:
     global _total_up_bytes
     if n and n >0:
-        async with _traffic_lock:
-            _total_up_bytes += n
-            _recent.append((time.time(), n,0))
-            _trim_recent_locked()
+        _total_up_bytes += n
+        _bucket_up[_current_bucket()] += n
 
-async def add_down_bytes(n: int) -> None:
+def add_down_bytes(n: int) -> None:
     global _total_down_bytes
     if n and n >0:
-        async with _traffic_lock:
-            _total_down_bytes += n
-            _recent.append((time.time(),0, n))
-            _trim_recent_locked()
+        _total_down_bytes += n
+        _bucket_down[_current_bucket()] += n
 
-async def record_request(domain: str, method: str, up_bytes: int, down_bytes: int) -> None:
+def record_request(domain: str, method: str, up_bytes: int, down_bytes: int) -> None:
     global _total_requests
-    async with _traffic_lock:
-        _total_requests +=1
-        _method_counts[method] +=1
-        stats = _domain_stats[domain]
-        stats['requests'] +=1
-        stats['up_bytes'] += up_bytes
-        stats['down_bytes'] += down_bytes
-    # Recent already appended via add_*; nothing extra needed
-
-def _trim_recent_locked() -> None:
-    cutoff = time.time() - _MAX_WINDOW_SECONDS
-    while _recent and _recent[0][0] < cutoff:
-        _recent.popleft()
+    _total_requests +=1
+    _method_counts[method] +=1
+    stats = _domain_stats.get(domain)
+    if stats is None:
+        stats = _domain_stats[domain] = DomainStat()
+    stats.requests +=1
+    stats.up_bytes += up_bytes
+    stats.down_bytes += down_bytes
+    # Bytes already counted via add_*; nothing extra needed
 
-def _compute_rates_locked() -> Dict[str, float]:
-    if not _recent:
+def _compute_rates(now: float) -> dict[str, float]:
+    cutoff = int(now) - _MAX_WINDOW_SECONDS
+    up =0
+    down =0
+    window_start = None
+    for sec, b_up, b_down in zip(_bucket_secs, _bucket_up, _bucket_down, strict=True):
+        if sec > cutoff:
+            up += b_up
+            down += b_down
+            if window_start is None or sec < window_start:
+                window_start = sec
+    if window_start is None:
         return {'up_bps':0.0, 'down_bps':0.0}
-    now = time.time()
-    window_start = _recent[0][0]
-    elapsed = max(0.001, now - window_start)
-    up = sum(r[1] for r in _recent)
-    down = sum(r[2] for r in _recent)
+    # Buckets are whole seconds, so never divide by less than one
+    elapsed = max(1.0, now - window_start)
     return {
         'up_bps': up / elapsed,
         'down_bps': down / elapsed
     }
 
 async def get_totals() -> dict:
-    async with _traffic_lock:
-        _trim_recent_locked()
-        rates = _compute_rates_locked()
-        uptime = time.time() - _start_time
-        return {
-            'total_up_bytes': _total_up_bytes,
-            'total_down_bytes': _total_down_bytes,
-            'total_bytes': _total_up_bytes + _total_down_bytes,
-            'total_requests': _total_requests,
-            'uptime_seconds': uptime,
-            'method_counts': dict(_method_counts),
-            'domain_stats': _domain_stats, # already plain ints
-            'rates': rates,
-            'window_seconds': _MAX_WINDOW_SECONDS
-        }
+    now = time.monotonic()
+    rates = _compute_rates(now)
+    uptime = now - _start_time
+    return {
+        'total_up_bytes': _total_up_bytes,
+        'total_down_bytes': _total_down_bytes,
+        'total_bytes': _total_up_bytes + _total_down_bytes,
+        'total_requests': _total_requests,
+        'uptime_seconds': uptime,
+        'method_counts': dict(_method_counts),
+        'domain_stats': _domain_stats, # DomainStat dataclasses, JSON-serialisable
+        'rates': rates,
+        'window_seconds': _MAX_WINDOW_SECONDS
+    }
 
 @router.get('/metrics/traffic')
 async def get_traffic_metrics():
@@ -91,12 +110,13 @@ async def get_traffic_metrics():
 @router.post('/metrics/traffic/reset')
 async def reset_traffic_metrics():
     global _total_up_bytes, _total_down_bytes, _total_requests
-    async with _traffic_lock:
-        _total_up_bytes =0
-        _total_down_bytes =0
-        _total_requests =0
-        _method_counts.clear()
-        _domain_stats.clear()
-        _recent.clear()
-        # keep start time
+    _total_up_bytes =0
+    _total_down_bytes =0
+    _total_requests =0
+    _method_counts.clear()
+    _domain_stats.clear()
+    _bucket_secs[:] = [_EMPTY_SEC] * _MAX_WINDOW_SECONDS
+    _bucket_up[:] = [0] * _MAX_WINDOW_SECONDS
+    _bucket_down[:] = [0] * _MAX_WINDOW_SECONDS
+    # keep start time
     return {'ok': True}
@@ -1,342 +1,602 @@
 from fastapi import APIRouter, Request, Response, HTTPException
 from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+import asyncio
+import contextlib
+import httpcore
 import httpx
 import logging
 import os
 import socket
 import time
-from typing import List, Dict
+from collections import OrderedDict
+from typing import List, FrozenSet, Optional, Tuple
 
 # Support relative and absolute imports so the app works when started from the test folder or as a package
 try:
     from .security import (
         extract_domain,
         is_domain_allowed,
+        is_ip_literal,
         is_private_ip,
-        compile_allowed_patterns,
+        is_valid_allowed_entry,
+        build_domain_matcher,
     )
     from .metrics import add_up_bytes, add_down_bytes, record_request
+    from .rate_limit import apply_rate_limit_headers, check_and_increment
+    # Old interface, kept importable from proxy (see CONTRIBUTING.md)
+    from .rate_limit import (  # noqa: F401
+        get_rate_limit_config,
+        get_window_usage,
+        update_rate_limit_config,
+    )
 except ImportError:  # pragma: no cover - fallback for direct execution
     from security import (
         extract_domain,
         is_domain_allowed,
+        is_ip_literal,
         is_private_ip,
-        compile_allowed_patterns,
+        is_valid_allowed_entry,
+        build_domain_matcher,
     )
     from metrics import add_up_bytes, add_down_bytes, record_request
+    from rate_limit import apply_rate_limit_headers, check_and_increment
+    # Old interface, kept importable from proxy (see CONTRIBUTING.md)
+    from rate_limit import (  # noqa: F401
+        get_rate_limit_config,
+        get_window_usage,
+        update_rate_limit_config,
+    )
+
+try:
+    import aiodns
+except ImportError:  # optional dependency, resolution falls back to loop.getaddrinfo
+    aiodns = None
+
+try:
+    import aiohttp
+    from httpx_aiohttp import AiohttpTransport
+except ImportError:  # optional dependency, httpx's own transport is used
+    aiohttp = None
+    AiohttpTransport = None
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-UPSTREAM_TIMEOUT = 15.0
+UPSTREAM_TIMEOUT = httpx.Timeout(15.0, connect=5.0)
 MAX_RESPONSE_SIZE = 100 * 1024 * 1024
+# Streamed bytes are reported to metrics in batches of at least this size
+DOWN_BYTES_FLUSH = 1024 * 1024
+UPSTREAM_LIMITS = httpx.Limits(
+    max_keepalive_connections=200, max_connections=500, keepalive_expiry=30.0
+)
+# "aiohttp" routes upstream calls through aiohttp's connector (HTTP/1.1 only)
+UPSTREAM_TRANSPORT_ENV = "UPSTREAM_TRANSPORT"
+
+# Hop-by-hop request headers that must not be forwarded upstream (ASGI lowercases names)
+_HOP_BY_HOP = frozenset({
+    b"host",
+    b"connection",
+    b"keep-alive",
+    b"transfer-encoding",
+    b"te",
+    b"trailers",
+    b"proxy-authorization",
+    b"proxy-authenticate",
+    b"upgrade",
+})
+
+# One pooled client for all upstream calls so keep-alive connections are reused
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        transport = None
+        if os.getenv(UPSTREAM_TRANSPORT_ENV) == "aiohttp":
+            if AiohttpTransport is None:
+                logger.warning(
+                    "UPSTREAM_TRANSPORT=aiohttp but httpx-aiohttp is not installed"
+                )
+            else:
+                transport = _vetted_aiohttp_transport()
+        if transport is None:
+            transport = _VettedTransport(UPSTREAM_LIMITS, http2=True)
+        _http_client = httpx.AsyncClient(timeout=UPSTREAM_TIMEOUT, transport=transport)
+    return _http_client
+
+
+async def close_http_client() -> None:
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+# hostname -> (expires_at, addresses, is_private), oldest first; failures are not cached
+DNS_CACHE_TTL = 60
+DNS_CACHE_SIZE = 4096
+_dns_cache: "OrderedDict[str, Tuple[float, Tuple[str, ...], bool]]" = OrderedDict()
+# c-ares channels are bound to the loop they were created on
+_dns_resolver: Optional[Tuple[asyncio.AbstractEventLoop, "aiodns.DNSResolver"]] = None
+
+
+async def _lookup(hostname: str) -> List[str]:
+    # Every A and AAAA answer, in resolver order
+    global _dns_resolver
+    loop = asyncio.get_running_loop()
+    if aiodns is None:
+        infos = await loop.getaddrinfo(
+            hostname, None, family=socket.AF_UNSPEC, type=socket.SOCK_STREAM
+        )
+        return [info[4][0] for info in infos]
+    if _dns_resolver is None or _dns_resolver[0] is not loop:
+        _dns_resolver = (loop, aiodns.DNSResolver(loop=loop))
+    try:
+        result = await _dns_resolver[1].getaddrinfo(
+            hostname, family=socket.AF_UNSPEC, type=socket.SOCK_STREAM
+        )
+    except aiodns.error.DNSError as e:
+        raise socket.gaierror(str(e)) from e
+    return [node.addr[0].decode("ascii") for node in result.nodes]
+
+
+async def _resolve_addresses(hostname: str) -> Tuple[Tuple[str, ...], bool]:
+    now = time.monotonic()
+    cached = _dns_cache.get(hostname)
+    if cached and cached[0] > now:
+        return cached[1], cached[2]
+    if is_ip_literal(hostname):
+        return (hostname,), is_private_ip(hostname)
+    ips = tuple(await _lookup(hostname))
+    if not ips:
+        raise socket.gaierror(f"No addresses for {hostname}")
+    # The connection may land on any of the answers, so one private address blocks
+    private = any(is_private_ip(addr) for addr in ips)
+    _dns_cache[hostname] = (now + DNS_CACHE_TTL, ips, private)
+    _dns_cache.move_to_end(hostname)
+    if len(_dns_cache) > DNS_CACHE_SIZE:
+        _dns_cache.popitem(last=False)
+    return ips, private
+
+
+async def resolve_host(hostname: str) -> Tuple[str, bool]:
+    ips, private = await _resolve_addresses(hostname)
+    return ips[0], private
+
+
+class PrivateAddressError(Exception):
+    # Raised at connect time when the vetted answer for a host is private
+    pass
+
+
+class _VettedBackend(httpcore.AsyncNetworkBackend):
+    # Upstream connections go to the addresses proxy_handler already vetted
+    # (via the shared cache) rather than a fresh lookup, so a DNS answer cannot
+    # change between the private-IP check and the connect. TLS still uses the
+    # hostname for SNI and verification, and the pool stays keyed by hostname
+    def __init__(self, backend: httpcore.AsyncNetworkBackend):
+        self._backend = backend
+
+    async def connect_tcp(
+        self, host, port, timeout=None, local_address=None, socket_options=None
+    ):
+        try:
+            ips, private = await _resolve_addresses(host)
+        except OSError as e:
+            raise httpcore.ConnectError(str(e)) from e
+        if private:
+            raise PrivateAddressError(f"{host} resolves to a private address")
+        error = None
+        for ip in ips:
+            try:
+                return await self._backend.connect_tcp(
+                    ip,
+                    port,
+                    timeout=timeout,
+                    local_address=local_address,
+                    socket_options=socket_options,
+                )
+            except (httpcore.ConnectError, httpcore.ConnectTimeout) as e:
+                # Try the next answer; if none connects, surface the last failure
+                error = e
+        raise error
+
+    async def connect_unix_socket(self, path, timeout=None, socket_options=None):
+        return await self._backend.connect_unix_socket(
+            path, timeout=timeout, socket_options=socket_options
+        )
+
+    async def sleep(self, seconds):
+        await self._backend.sleep(seconds)
+
+
+# httpcore errors and the httpx ones callers expect, subclasses before bases
+_HTTPCORE_ERRORS = (
+    (httpcore.ConnectTimeout, httpx.ConnectTimeout),
+    (httpcore.ReadTimeout, httpx.ReadTimeout),
+    (httpcore.WriteTimeout, httpx.WriteTimeout),
+    (httpcore.PoolTimeout, httpx.PoolTimeout),
+    (httpcore.TimeoutException, httpx.TimeoutException),
+    (httpcore.ConnectError, httpx.ConnectError),
+    (httpcore.ReadError, httpx.ReadError),
+    (httpcore.WriteError, httpx.WriteError),
+    (httpcore.NetworkError, httpx.NetworkError),
+    (httpcore.ProxyError, httpx.ProxyError),
+    (httpcore.UnsupportedProtocol, httpx.UnsupportedProtocol),
+    (httpcore.LocalProtocolError, httpx.LocalProtocolError),
+    (httpcore.RemoteProtocolError, httpx.RemoteProtocolError),
+    (httpcore.ProtocolError, httpx.ProtocolError),
+)
+
+
+@contextlib.contextmanager
+def _httpx_errors():
+    try:
+        yield
+    except Exception as e:
+        for core_error, httpx_error in _HTTPCORE_ERRORS:
+            if isinstance(e, core_error):
+                raise httpx_error(str(e)) from e
+        raise
+
+
+class _VettedResponseStream(httpx.AsyncByteStream):
+    def __init__(self, stream) -> None:
+        self._stream = stream
+
+    async def __aiter__(self):
+        with _httpx_errors():
+            async for part in self._stream:
+                yield part
+
+    async def aclose(self) -> None:
+        await self._stream.aclose()
+
+
+class _VettedTransport(httpx.AsyncBaseTransport):
+    # Same request/response plumbing as httpx.AsyncHTTPTransport, over a
+    # connection pool that dials through _VettedBackend
+    def __init__(self, limits: httpx.Limits, http2: bool = False) -> None:
+        self._pool = httpcore.AsyncConnectionPool(
+            ssl_context=httpx.create_ssl_context(),
+            max_connections=limits.max_connections,
+            max_keepalive_connections=limits.max_keepalive_connections,
+            keepalive_expiry=limits.keepalive_expiry,
+            http2=http2,
+            network_backend=_VettedBackend(httpcore.AnyIOBackend()),
+        )
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        core_request = httpcore.Request(
+            method=request.method,
+            url=httpcore.URL(
+                scheme=request.url.raw_scheme,
+                host=request.url.raw_host,
+                port=request.url.port,
+                target=request.url.raw_path,
+            ),
+            headers=request.headers.raw,
+            content=request.stream,
+            extensions=request.extensions,
+        )
+        with _httpx_errors():
+            core_response = await self._pool.handle_async_request(core_request)
+        return httpx.Response(
+            status_code=core_response.status,
+            headers=core_response.headers,
+            stream=_VettedResponseStream(core_response.stream),
+            extensions=core_response.extensions,
+        )
+
+    async def aclose(self) -> None:
+        await self._pool.aclose()
+
+
+def _vetted_aiohttp_transport() -> httpx.AsyncBaseTransport:
+    # aiohttp resolves hostnames itself; give it a resolver that hands back the
+    # vetted addresses, and no DNS cache of its own
+    class _VettedResolver(aiohttp.abc.AbstractResolver):
+        async def resolve(self, host, port=0, family=socket.AF_INET):
+            ips, private = await _resolve_addresses(host)
+            if private:
+                raise PrivateAddressError(f"{host} resolves to a private address")
+            results = []
+            for ip in ips:
+                ip_family = socket.AF_INET6 if ":" in ip else socket.AF_INET
+                if family in (socket.AF_UNSPEC, ip_family):
+                    results.append({
+                        "hostname": host,
+                        "host": ip,
+                        "port": port,
+                        "family": ip_family,
+                        "proto": 0,
+                        "flags": socket.AI_NUMERICHOST,
+                    })
+            return results
+
+        async def close(self):
+            pass
+
+    def make_session():
+        connector = aiohttp.TCPConnector(
+            limit=UPSTREAM_LIMITS.max_connections,
+            keepalive_timeout=UPSTREAM_LIMITS.keepalive_expiry,
+            resolver=_VettedResolver(),
+            use_dns_cache=False,
+        )
+        return aiohttp.ClientSession(connector=connector)
+
+    return AiohttpTransport(limits=UPSTREAM_LIMITS, client=make_session)
 
 # Allowed domains
 ALLOWED_DOMAINS_ENV = os.getenv("ALLOWED_DOMAINS", "")
 allowed_domains: List[str] = [d.strip() for d in ALLOWED_DOMAINS_ENV.split(",")] if ALLOWED_DOMAINS_ENV else []
-allowed_patterns = compile_allowed_patterns(allowed_domains)
+# Rebuilt on every mutation: exact literals in a set, the rest fused into one regex
+domain_matcher = build_domain_matcher(allowed_domains)
+# Bumped on every mutation so callers can cache views of allowed_domains
+_allowed_version = 0
 
-def _recompile_allowed():
-    global allowed_patterns
-    allowed_patterns = compile_allowed_patterns(allowed_domains)
+def get_allowed_version() -> int:
+    return _allowed_version
 
 def add_allowed_domain(pattern: str) -> bool:
+    global _allowed_version, domain_matcher
     pattern = pattern.strip()
     if not pattern:
         return False
     if pattern in allowed_domains:
         return True
-    try:
-        compile_allowed_patterns([pattern]) # test compiling
-    except Exception:
+    if not is_valid_allowed_entry(pattern):
         return False
     allowed_domains.append(pattern)
-    _recompile_allowed()
+    domain_matcher = build_domain_matcher(allowed_domains)
+    _allowed_version += 1
     return True
 
 def remove_allowed_domain(pattern: str) -> bool:
+    global _allowed_version, domain_matcher
     pattern = pattern.strip()
     if pattern in allowed_domains:
         allowed_domains.remove(pattern)
-        _recompile_allowed()
+        domain_matcher = build_domain_matcher(allowed_domains)
+        _allowed_version += 1
         return True
     return False
 
-# --------------------------- Rate limit state ---------------------------
-RATE_LIMIT_ENABLED = False
-RATE_LIMIT_WINDOW_SECONDS = 60
-RATE_LIMIT_MAX_IP = 120  # None means unlimited
-RATE_LIMIT_MAX_DOMAIN = 300  # None means unlimited
-_rate_ip_counts: Dict[str, int] = {}
-_rate_domain_counts: Dict[str, int] = {}
-_rate_window_id: int = int(time.time() // RATE_LIMIT_WINDOW_SECONDS)
-_rate_reset_epoch: int = (_rate_window_id + 1) * RATE_LIMIT_WINDOW_SECONDS
-
-
-def _current_window_id() -> int:
-    return int(time.time() // RATE_LIMIT_WINDOW_SECONDS)
-
-
-def _rotate_window_if_needed() -> None:
-    global _rate_window_id, _rate_reset_epoch, _rate_ip_counts, _rate_domain_counts
-    wid = _current_window_id()
-    if wid != _rate_window_id:
-        _rate_window_id = wid
-        _rate_reset_epoch = (wid + 1) * RATE_LIMIT_WINDOW_SECONDS
-        _rate_ip_counts = {}
-        _rate_domain_counts = {}
-
-
-def get_rate_limit_config() -> Dict[str, int | bool | None]:
-    return {
-        "enabled": RATE_LIMIT_ENABLED,
-        "window_seconds": RATE_LIMIT_WINDOW_SECONDS,
-        "max_requests_per_ip": RATE_LIMIT_MAX_IP,
-        "max_requests_per_domain": RATE_LIMIT_MAX_DOMAIN,
-        "reset_epoch": _rate_reset_epoch,
-    }
-
-
-def update_rate_limit_config() -> Dict[str, int | bool | None]:
-    global RATE_LIMIT_ENABLED, RATE_LIMIT_WINDOW_SECONDS, RATE_LIMIT_MAX_IP, RATE_LIMIT_MAX_DOMAIN, _rate_window_id, _rate_reset_epoch
-    if "enabled" in kwargs:
-        RATE_LIMIT_ENABLED = bool(kwargs["enabled"])
-    if "window_seconds" in kwargs and isinstance(kwargs["window_seconds"], int) and kwargs["window_seconds"] > 0:
-        RATE_LIMIT_WINDOW_SECONDS = kwargs["window_seconds"]
-    if "max_requests_per_ip" in kwargs:
-        RATE_LIMIT_MAX_IP = kwargs["max_requests_per_ip"]
-    if "max_requests_per_domain" in kwargs:
-        RATE_LIMIT_MAX_DOMAIN = kwargs["max_requests_per_domain"]
-    # Force rotate to apply new window size immediately
-    _rate_window_id = _current_window_id()
-    _rate_reset_epoch = (_rate_window_id + 1) * RATE_LIMIT_WINDOW_SECONDS
-    return get_rate_limit_config()
-
-
-def get_window_usage() -> Dict[str, Dict[str, int] | int | bool]:
-    _rotate_window_if_needed()
-    if not RATE_LIMIT_ENABLED:
-        return {"enabled": False}
-    return {
-        "enabled": True,
-        "window_id": _rate_window_id,
-        "window_seconds": RATE_LIMIT_WINDOW_SECONDS,
-        "reset_epoch": _rate_reset_epoch,
-        "counts_ip": dict(_rate_ip_counts),
-        "counts_domain": dict(_rate_domain_counts),
-        "max_requests_per_ip": RATE_LIMIT_MAX_IP,
-        "max_requests_per_domain": RATE_LIMIT_MAX_DOMAIN,
-    }
-
-
-def check_and_increment(ip: str, domain: str) -> (bool, Dict[str, int | bool | None]):
-    _rotate_window_if_needed()
-    if not RATE_LIMIT_ENABLED:
-        return True, {"enabled": False, "limit_ip": None, "remaining_ip": None, "limit_domain": None, "remaining_domain": None, "reset": None}
-    ip_key = ip or "unknown"
-    dom_key = domain or "unknown"
-    ip_count = _rate_ip_counts.get(ip_key, 0)
-    dom_count = _rate_domain_counts.get(dom_key, 0)
-    allowed = True
-    if RATE_LIMIT_MAX_IP is not None and ip_count >= RATE_LIMIT_MAX_IP:
-        allowed = False
-    if RATE_LIMIT_MAX_DOMAIN is not None and dom_count >= RATE_LIMIT_MAX_DOMAIN:
-        allowed = False
-    if allowed:
-        _rate_ip_counts[ip_key] = ip_count + 1
-        _rate_domain_counts[dom_key] = dom_count + 1
-        remaining_ip = None
-        remaining_domain = None
-        if RATE_LIMIT_MAX_IP is not None:
-            remaining_ip = max(RATE_LIMIT_MAX_IP - (ip_count + (1 if allowed else 0)), 0)
-        if RATE_LIMIT_MAX_DOMAIN is not None:
-            remaining_domain = max(RATE_LIMIT_MAX_DOMAIN - (dom_count + (1 if allowed else 0)), 0)
-        meta = {
-            "enabled": True,
-            "limit_ip": RATE_LIMIT_MAX_IP,
-            "remaining_ip": remaining_ip,
-            "limit_domain": RATE_LIMIT_MAX_DOMAIN,
-            "remaining_domain": remaining_domain,
-            "reset": _rate_reset_epoch,
-        }
-        return allowed, meta
-
-# -----------------------------------------------------------------------
-
-def _sanitize_headers(src_headers: Dict[str, str]) -> Dict[str, str]:
-    h = dict(src_headers)
-    for key in (
-        "content-length",
-        "Content-Length",
-        "transfer-encoding",
-        "Transfer-Encoding",
-        "connection",
-        "Connection",
-        "content-encoding",
-        "Content-Encoding",
-        "etag",
-        "ETag",
+
+# Upstream response headers not relayed: hop-by-hop ones, plus Content-Length
+# since we re-frame the body
+_STRIP_RESPONSE_HEADERS = frozenset({
+    b"content-length",
+    b"transfer-encoding",
+    b"connection",
+    b"keep-alive",
+    b"proxy-authenticate",
+    b"trailer",
+    b"upgrade",
+})
+
+def _upstream_headers(
+    src_headers: httpx.Headers, strip: FrozenSet[bytes]
+) -> List[Tuple[bytes, bytes]]:
+    # Raw (bytes, bytes) pairs keep repeated headers such as Set-Cookie separate
+    return [
+        (key, value)
+        for raw_key, value in src_headers.raw
+        if (key := raw_key.lower()) not in strip
+    ]
+
+
+async def _check_upstream_address(domain: str) -> None:
+    # DNS and private IP block
+    try:
+        ip, private = await resolve_host(domain)
+        logger.info("Resolved %s to %s", domain, ip)
+        if private:
+            logger.warning("Blocked access to private IP: %s", ip)
+            raise HTTPException(
+                status_code=403, detail="Access to private IP ranges is forbidden"
+            )
+    except OSError as e:
+        logger.error("Cannot resolve hostname %s", domain)
+        raise HTTPException(
+            status_code=502, detail="Name or service not known"
+        ) from e
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.warning("Error during IP resolution: %s", e)
+
+
+def _forward_headers(request: Request) -> List[Tuple[bytes, bytes]]:
+    headers = [(k, v) for k, v in request.headers.raw if k not in _HOP_BY_HOP]
+    # Streamed bodies are passed through undecoded, so never let httpx's default
+    # Accept-Encoding ask upstream for a coding the client did not offer
+    if "accept-encoding" not in request.headers:
+        headers.append((b"accept-encoding", b"identity"))
+    return headers
+
+
+def _upload_body(request: Request, up_len_local: List[int]):
+    if request.method not in ("POST", "PUT", "PATCH") or (
+        "transfer-encoding" not in request.headers
+        and request.headers.get("content-length", "0") == "0"
     ):
-        h.pop(key, None)
-    return h
+        return None
+
+    async def body_iter():
+        async for chunk in request.stream():
+            up_len_local[0] += len(chunk)
+            yield chunk
+        add_up_bytes(up_len_local[0])
+
+    # Forward the upload as it arrives instead of buffering it first
+    return body_iter()
+
+
+def _check_content_length(headers: httpx.Headers) -> None:
+    # Check Content-Length header if available
+    content_length = headers.get("content-length")
+    if not content_length:
+        return
+    try:
+        too_large = int(content_length) > MAX_RESPONSE_SIZE
+    except ValueError:
+        return
+    if too_large:
+        logger.warning("Response too large: %s bytes", content_length)
+        raise HTTPException(status_code=413, detail="Payload too large")
+
+
+def _relay_response(
+    httpx_response: httpx.Response,
+    target_url: str,
+    domain: str,
+    method: str,
+    up_len_local: List[int],
+) -> StreamingResponse:
+    logger.info(
+        "Received response from %s: %s", target_url, httpx_response.status_code
+    )
+
+    _check_content_length(httpx_response.headers)
+
+    # Every body is streamed, whatever its type or size, so memory per
+    # request stays bounded by the chunk size
+    down_len_local = [0]
+    recorded = [False]
+
+    def record_once():
+        # The generator's cleanup records aborted transfers too; finalize covers
+        # a body that was never iterated
+        if not recorded[0]:
+            recorded[0] = True
+            record_request(domain, method, up_len_local[0], down_len_local[0])
+
+    async def stream_generator():
+        # Content-Length may be absent or wrong, so enforce the cap as we go
+        size_left = MAX_RESPONSE_SIZE
+        pending = 0
+        try:
+            async for chunk in httpx_response.aiter_raw():
+                clen = len(chunk)
+                size_left -= clen
+                if size_left < 0:
+                    logger.warning("Response too large, aborting: %s", target_url)
+                    # Abort instead of ending cleanly so the client cannot
+                    # mistake a truncated body for a complete one
+                    raise RuntimeError("Upstream response exceeds size limit")
+                down_len_local[0] += clen
+                pending += clen
+                if pending >= DOWN_BYTES_FLUSH:
+                    add_down_bytes(pending)
+                    pending = 0
+                yield chunk
+        finally:
+            add_down_bytes(pending)
+            await httpx_response.aclose()
+            record_once()
+
+    async def finalize():
+        await httpx_response.aclose()
+        record_once()
+
+    # Upstream Content-Type is relayed as-is; only default it when absent
+    content_type = httpx_response.headers.get("content-type")
+    response = StreamingResponse(
+        stream_generator(),
+        status_code=httpx_response.status_code,
+        media_type=None if content_type else "text/plain",
+        background=BackgroundTask(finalize),
+    )
+    # Relayed still encoded, so Content-Encoding and ETag stay valid
+    response.raw_headers.extend(
+        _upstream_headers(httpx_response.headers, _STRIP_RESPONSE_HEADERS)
+    )
+    return response
 
 
 @router.api_route("/proxy/{target:path}", methods=["GET", "POST", "PUT", "DELETE", "PATCH", "HEAD", "OPTIONS"])
 async def proxy_handler(request: Request, target: str) -> Response:
     client_ip = request.client.host if request.client else "unknown"
-    logger.info(f"Proxy request from {client_ip}: {request.method} /proxy/{target}")
+    logger.info("Proxy request from %s: %s /proxy/%s", client_ip, request.method, target)
 
     # Build target URL
-    if not target.startswith(("http://", "https://")):
-        target_url = f"https://{target}"
-    else:
-        target_url = target
+    target_url = (
+        target if target.startswith(("http://", "https://")) else f"https://{target}"
+    )
 
     # Allowlist check
     domain = extract_domain(target_url)
     if domain is None:
-        logger.warning(f"Invalid target URL: {target_url}")
+        logger.warning("Invalid target URL: %s", target_url)
         raise HTTPException(status_code=400, detail="Invalid target URL")
 
-    if not is_domain_allowed(domain, allowed_patterns):
-        logger.warning(f"Domain not allowed: {domain}")
+    if not is_domain_allowed(domain, domain_matcher):
+        logger.warning("Domain not allowed: %s", domain)
         raise HTTPException(status_code=403, detail="Domain not allowed")
 
     # Rate limit check
-    allowed_rl, rl_meta = check_and_increment(client_ip, domain)
+    allowed_rl, rl_meta = await check_and_increment(client_ip, domain)
     if not allowed_rl:
         raise HTTPException(status_code=429, detail="Rate limit exceeded")
 
-    # DNS and private IP block
-    try:
-        ip = socket.gethostbyname(domain)
-        logger.info(f"Resolved {domain} to {ip}")
-        if is_private_ip(ip):
-            logger.warning(f"Blocked access to private IP: {ip}")
-            raise HTTPException(status_code=403, detail="Access to private IP ranges is forbidden")
-    except socket.gaierror:
-        logger.error(f"Cannot resolve hostname {domain}")
-        raise HTTPException(status_code=502, detail="Name or service not known")
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.warning(f"Error during IP resolution: {e}")
+    await _check_upstream_address(domain)
 
     method = request.method
-    headers = dict(request.headers)
-    headers.pop("host", None)
+    headers = _forward_headers(request)
 
-    logger.info(f"Forwarding {method} request to {target_url}")
+    logger.info("Forwarding %s request to %s", method, target_url)
 
-    async with httpx.AsyncClient(timeout=UPSTREAM_TIMEOUT) as client:
-        try:
-            up_len = 0
-            if method in ("POST", "PUT", "PATCH"):
-                body = await request.body()
-                up_len = len(body)
-                await add_up_bytes(up_len)
-                httpx_response = await client.request(
-                    method=method,
-                    url=target_url,
-                    headers=headers,
-                    content=body if body else None,
-                )
-            else:
-                httpx_response = await client.request(
-                    method=method, url=target_url, headers=headers
-                )
-
-            logger.info(
-                f"Received response from {target_url}: {httpx_response.status_code}"
-            )
+    # Filled in by the upload body as it is forwarded
+    up_len_local = [0]
+    body = _upload_body(request, up_len_local)
 
-            # Check Content-Length header if available
-            content_length = httpx_response.headers.get("content-length")
-            if content_length:
-                try:
-                    length = int(content_length)
-                    if length > MAX_RESPONSE_SIZE:
-                        logger.warning(f"Response too large: {length} bytes")
-                        raise HTTPException(status_code=413, detail="Payload too large")
-                except ValueError:
-                    pass
-
-            # Determine if response is text-based
-            content_type = httpx_response.headers.get("content-type", "").lower()
-            is_text_content = (
-                "text" in content_type
-                or "json" in content_type
-                or "xml" in content_type
-                or "javascript" in content_type
-                or "html" in content_type
-                or content_type == ""
-            )
-
-            if is_text_content:
-                down_len = len(httpx_response.content)
-                await add_down_bytes(down_len)
-                await record_request(domain, method, up_len, down_len)
-
-                resp = Response(
-                    content=httpx_response.content,
-                    status_code=httpx_response.status_code,
-                    headers=_sanitize_headers(httpx_response.headers),
-                    media_type=content_type or "text/plain",
-                )
-                if rl_meta.get('enabled'):
-                    resp.headers['X-RateLimit-Limit-IP'] = str(rl_meta.get('limit_ip'))
-                    resp.headers['X-RateLimit-Remaining-IP'] = str(rl_meta.get('remaining_ip'))
-                    resp.headers['X-RateLimit-Limit-Domain'] = str(rl_meta.get('limit_domain'))
-                    resp.headers['X-RateLimit-Remaining-Domain'] = str(rl_meta.get('remaining_domain'))
-                    resp.headers['X-RateLimit-Reset'] = str(rl_meta.get('reset'))
-                return resp
-            else:
-                down_len_local = [0]
-
-                async def stream_generator():
-                    async for chunk in httpx_response.aiter_bytes():
-                        clen = len(chunk)
-                        await add_down_bytes(clen)
-                        down_len_local[0] += clen
-                        yield chunk
-
-                response = StreamingResponse(
-                    stream_generator(),
-                    status_code=httpx_response.status_code,
-                    headers=_sanitize_headers(httpx_response.headers),
-                    media_type=content_type,
-                )
+    client = get_http_client()
+    try:
+        upstream_request = client.build_request(
+            method, target_url, headers=headers, content=body
+        )
+        # stream=True: the body is read chunk by chunk and the connection is
+        # released once the response has been relayed (or on error below)
+        httpx_response = await client.send(upstream_request, stream=True)
+    except PrivateAddressError as e:
+        # DNS changed to a private answer between the check above and the connect
+        logger.warning("Blocked access to private IP at connect time: %s", e)
+        raise HTTPException(
+            status_code=403, detail="Access to private IP ranges is forbidden"
+        ) from e
+    except httpx.TimeoutException as e:
+        logger.error("Upstream timeout for %s: %s", target_url, e)
+        raise HTTPException(status_code=504, detail="Upstream timeout") from e
+    except httpx.RequestError as e:
+        logger.error("Proxy error for %s: %s", target_url, e)
+        if "Name or service not known" in str(e) or "getaddrinfo failed" in str(e):
+            raise HTTPException(
+                status_code=502, detail="Name or service not known"
+            ) from e
+        return Response(
+            content=f"Proxy error: {str(e)}",
+            status_code=500,
+            media_type="text/plain",
+        )
+    except Exception as e:
+        logger.error("Unexpected error for %s: %s", target_url, e)
+        return Response(
+            content=f"Unexpected error: {str(e)}",
+            status_code=500,
+            media_type="text/plain",
+        )
 
-                async def finalize():
-                    await record_request(domain, method, up_len, down_len_local[0])
-                response.background = finalize # FastAPI will run coroutine
-                if rl_meta.get('enabled'):
-                    response.headers['X-RateLimit-Limit-IP'] = str(rl_meta.get('limit_ip'))
-                    response.headers['X-RateLimit-Remaining-IP'] = str(rl_meta.get('remaining_ip'))
-                    response.headers['X-RateLimit-Limit-Domain'] = str(rl_meta.get('limit_domain'))
-                    response.headers['X-RateLimit-Remaining-Domain'] = str(rl_meta.get('remaining_domain'))
-                    response.headers['X-RateLimit-Reset'] = str(rl_meta.get('reset'))
-                return response
-
-        except httpx.TimeoutException as e:
-            logger.error(f"Upstream timeout for {target_url}: {e}")
-            raise HTTPException(status_code=504, detail="Upstream timeout")
-        except httpx.RequestError as e:
-            logger.error(f"Proxy error for {target_url}: {e}")
-            if "Name or service not known" in str(e) or "getaddrinfo failed" in str(e):
-                raise HTTPException(status_code=502, detail="Name or service not known")
-            return Response(
-                content=f"Proxy error: {str(e)}",
-                status_code=500,
-                media_type="text/plain",
-            )
-        except HTTPException:
-            raise
-        except Exception as e:
-            logger.error(f"Unexpected error for {target_url}: {e}")
-            return Response(
-                content=f"Unexpected error: {str(e)}",
-                status_code=500,
-                media_type="text/plain",
-            )
+    try:
+        response = _relay_response(
+            httpx_response, target_url, domain, method, up_len_local
+        )
+    except BaseException:
+        # Nothing is streaming yet, so release the upstream connection here
+        await httpx_response.aclose()
+        raise
+    apply_rate_limit_headers(response.headers, rl_meta)
+    return response
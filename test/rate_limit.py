@@ -1,116 +1,203 @@
-import asyncio
+import os
 import time
-from typing import Dict, Tuple
-
-# Rate limiting: simple fixed window counters per IP and per domain.
-
-_config_lock = asyncio.Lock()
-_state_lock = asyncio.Lock()
-
-_config = {
- "enabled": False,
- "window_seconds":60,
- "max_requests_per_ip":120, # None -> no limit
- "max_requests_per_domain":300, # None -> no limit
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, replace
+
+# Rate limiting: per IP and per domain, over an approximate sliding window.
+# Nothing here awaits, so each call runs to completion on the event loop and
+# the counters need no lock
+
+# Tracked keys per counter table; the least recently seen key is evicted first
+RATE_LIMIT_MAX_IPS = int(os.getenv("RATE_LIMIT_MAX_IPS", "16384"))
+RATE_LIMIT_MAX_DOMAINS = int(os.getenv("RATE_LIMIT_MAX_DOMAINS", "16384"))
+
+
+@dataclass(frozen=True)
+class _Config:
+    enabled: bool = False
+    window_seconds: int = 60
+    max_requests_per_ip: int | None = 120  # None -> no limit
+    max_requests_per_domain: int | None = 300  # None -> no limit
+
+
+# Replaced wholesale on update, never mutated, so readers need no lock
+_config_snapshot = _Config()
+# Header values for the limits, refreshed only when the config changes
+_limit_header_values: tuple[str, str] = (
+    str(_config_snapshot.max_requests_per_ip),
+    str(_config_snapshot.max_requests_per_domain),
+)
+
+
+class _BoundedCounts(OrderedDict):
+    # Fixed-size counter zone: a flood of unique keys evicts stale ones instead
+    # of growing without bound. Missing keys read as 0 without being inserted
+    def __init__(self, maxsize: int):
+        super().__init__()
+        self.maxsize = maxsize
+
+    def __missing__(self, key):
+        return 0
+
+    def __setitem__(self, key, value):
+        if key in self:
+            self.move_to_end(key)
+        elif len(self) >= self.maxsize:
+            self.popitem(last=False)
+        super().__setitem__(key, value)
+
+
+# Approximate sliding window: counts for the current and the previous fixed
+# window, the latter weighted by how much of it the sliding window still covers.
+# Rollover swaps the two generations instead of scanning keys
+_window_id: int = -1
+_ip_counts: dict[str, int] = _BoundedCounts(RATE_LIMIT_MAX_IPS)
+_domain_counts: dict[str, int] = _BoundedCounts(RATE_LIMIT_MAX_DOMAINS)
+_prev_ip_counts: dict[str, int] = _BoundedCounts(RATE_LIMIT_MAX_IPS)
+_prev_domain_counts: dict[str, int] = _BoundedCounts(RATE_LIMIT_MAX_DOMAINS)
+
+# Shared by every request while limiting is off; callers only read it
+_DISABLED_META = {
+    "enabled": False,
+    "limit_ip": None,
+    "remaining_ip": None,
+    "limit_domain": None,
+    "remaining_domain": None,
+    "reset": None,
 }
 
-_ip_counts: Dict[Tuple[int, str], int] = {}
-_domain_counts: Dict[Tuple[int, str], int] = {}
-
 
 def _current_window_id(window_seconds: int) -> int:
- return int(time.time() // window_seconds)
+    return int(time.time() // window_seconds)
+
+
+def _config_dict(cfg: _Config) -> dict:
+    out = asdict(cfg)
+    window = cfg.window_seconds
+    out["reset_epoch"] = (_current_window_id(window) + 1) * window
+    return out
 
 
 async def get_rate_limit_config() -> dict:
- async with _config_lock:
- return dict(_config)
+    return _config_dict(_config_snapshot)
 
 
 async def update_rate_limit_config(**kwargs) -> dict:
- async with _config_lock:
- for k, v in kwargs.items():
- if k in _config and v is not None:
- _config[k] = v
- return dict(_config)
-
-
-async def _prune_old(window_id: int) -> None:
- # Remove previous window entries to keep memory bounded
- old_ip_keys = [k for k in _ip_counts if k[0] < window_id]
- for k in old_ip_keys:
- _ip_counts.pop(k, None)
- old_dom_keys = [k for k in _domain_counts if k[0] < window_id]
- for k in old_dom_keys:
- _domain_counts.pop(k, None)
-
-
-async def check_and_increment(ip: str, domain: str) -> Tuple[bool, dict]:
- cfg = await get_rate_limit_config()
- if not cfg["enabled"]:
- return True, {
- "enabled": False,
- "limit_ip": None,
- "remaining_ip": None,
- "limit_domain": None,
- "remaining_domain": None,
- "reset": None,
- }
-
- window_id = _current_window_id(cfg["window_seconds"])
- reset_epoch = (window_id +1) * cfg["window_seconds"]
-
- async with _state_lock:
- await _prune_old(window_id)
- ip_key = (window_id, ip or "unknown")
- dom_key = (window_id, domain or "unknown")
- ip_count = _ip_counts.get(ip_key,0)
- dom_count = _domain_counts.get(dom_key,0)
-
- allowed = True
- if cfg["max_requests_per_ip"] is not None and ip_count >= cfg["max_requests_per_ip"]:
- allowed = False
- if cfg["max_requests_per_domain"] is not None and dom_count >= cfg["max_requests_per_domain"]:
- allowed = False
-
- if allowed:
- _ip_counts[ip_key] = ip_count +1
- _domain_counts[dom_key] = dom_count +1
-
- # Remaining values (after consuming this request if allowed)
- remaining_ip = None
- remaining_domain = None
- if cfg["max_requests_per_ip"] is not None:
- remaining_ip = max(cfg["max_requests_per_ip"] - (ip_count + (1 if allowed else0)),0)
- if cfg["max_requests_per_domain"] is not None:
- remaining_domain = max(cfg["max_requests_per_domain"] - (dom_count + (1 if allowed else0)),0)
-
- return allowed, {
- "enabled": True,
- "limit_ip": cfg["max_requests_per_ip"],
- "remaining_ip": remaining_ip,
- "limit_domain": cfg["max_requests_per_domain"],
- "remaining_domain": remaining_domain,
- "reset": reset_epoch,
- }
+    global _config_snapshot, _limit_header_values  # noqa: PLW0603
+    changes = {}
+    if "enabled" in kwargs:
+        changes["enabled"] = bool(kwargs["enabled"])
+    window = kwargs.get("window_seconds")
+    if isinstance(window, int) and window > 0:
+        changes["window_seconds"] = window
+    # None is a valid value here: it lifts the limit
+    for key in ("max_requests_per_ip", "max_requests_per_domain"):
+        if key in kwargs:
+            changes[key] = kwargs[key]
+    cfg = _config_snapshot = replace(_config_snapshot, **changes)
+    _limit_header_values = (
+        str(cfg.max_requests_per_ip),
+        str(cfg.max_requests_per_domain),
+    )
+    return _config_dict(cfg)
+
+
+def _advance_window(window_id: int) -> None:
+    global _window_id  # noqa: PLW0603
+    global _ip_counts, _domain_counts, _prev_ip_counts, _prev_domain_counts
+    if window_id == _window_id:
+        return
+    if window_id == _window_id + 1:
+        _prev_ip_counts, _ip_counts = _ip_counts, _prev_ip_counts
+        _prev_domain_counts, _domain_counts = _domain_counts, _prev_domain_counts
+    else:
+        # Idle for a whole window, or the window size changed: nothing carries over
+        _prev_ip_counts.clear()
+        _prev_domain_counts.clear()
+    _ip_counts.clear()
+    _domain_counts.clear()
+    _window_id = window_id
+
+
+async def check_and_increment(ip: str, domain: str) -> tuple[bool, dict]:
+    cfg = _config_snapshot
+    if not cfg.enabled:
+        return True, _DISABLED_META
+
+    now = time.time()
+    window_id = int(now // cfg.window_seconds)
+    reset_epoch = (window_id + 1) * cfg.window_seconds
+    # Share of the previous window still inside the sliding window
+    prev_weight = (reset_epoch - now) / cfg.window_seconds
+    _advance_window(window_id)
+
+    max_ip = cfg.max_requests_per_ip
+    max_domain = cfg.max_requests_per_domain
+    ip_key = ip or "unknown"
+    dom_key = domain or "unknown"
+    ip_count = _ip_counts[ip_key]
+    dom_count = _domain_counts[dom_key]
+    ip_used = ip_count + _prev_ip_counts.get(ip_key, 0) * prev_weight
+    dom_used = dom_count + _prev_domain_counts.get(dom_key, 0) * prev_weight
+
+    allowed = True
+    if max_ip is not None and ip_used >= max_ip:
+        allowed = False
+    if max_domain is not None and dom_used >= max_domain:
+        allowed = False
+
+    if allowed:
+        ip_used += 1
+        dom_used += 1
+        ip_count += 1
+        dom_count += 1
+    # Written back even when rejected so clients being limited stay most recent
+    _ip_counts[ip_key] = ip_count
+    _domain_counts[dom_key] = dom_count
+
+    # Remaining values (after consuming this request if allowed)
+    remaining_ip = None
+    remaining_domain = None
+    if max_ip is not None:
+        remaining_ip = max(int(max_ip - ip_used), 0)
+    if max_domain is not None:
+        remaining_domain = max(int(max_domain - dom_used), 0)
+
+    return allowed, {
+        "enabled": True,
+        "limit_ip": max_ip,
+        "remaining_ip": remaining_ip,
+        "limit_domain": max_domain,
+        "remaining_domain": remaining_domain,
+        "reset": reset_epoch,
+    }
+
+
+def apply_rate_limit_headers(headers, meta: dict) -> None:
+    if not meta["enabled"]:
+        return
+    limit_ip, limit_domain = _limit_header_values
+    headers["X-RateLimit-Limit-IP"] = limit_ip
+    headers["X-RateLimit-Remaining-IP"] = str(meta["remaining_ip"])
+    headers["X-RateLimit-Limit-Domain"] = limit_domain
+    headers["X-RateLimit-Remaining-Domain"] = str(meta["remaining_domain"])
+    headers["X-RateLimit-Reset"] = str(meta["reset"])
 
 
 async def get_window_usage() -> dict:
- cfg = await get_rate_limit_config()
- if not cfg["enabled"]:
- return {"enabled": False}
-
- window_id = _current_window_id(cfg["window_seconds"])
- async with _state_lock:
- per_ip = {ip: c for (wid, ip), c in _ip_counts.items() if wid == window_id}
- per_domain = {dom: c for (wid, dom), c in _domain_counts.items() if wid == window_id}
- return {
- "enabled": True,
- "window_seconds": cfg["window_seconds"],
- "window_id": window_id,
- "max_requests_per_ip": cfg["max_requests_per_ip"],
- "max_requests_per_domain": cfg["max_requests_per_domain"],
- "reset_epoch": (window_id +1) * cfg["window_seconds"],
- "counts_ip": per_ip,
- "counts_domain": per_domain,
- }
+    cfg = _config_snapshot
+    if not cfg.enabled:
+        return {"enabled": False}
+
+    window_id = _current_window_id(cfg.window_seconds)
+    _advance_window(window_id)
+    return {
+        "enabled": True,
+        "window_seconds": cfg.window_seconds,
+        "window_id": window_id,
+        "max_requests_per_ip": cfg.max_requests_per_ip,
+        "max_requests_per_domain": cfg.max_requests_per_domain,
+        "reset_epoch": (window_id + 1) * cfg.window_seconds,
+        "counts_ip": dict(_ip_counts),
+        "counts_domain": dict(_domain_counts),
+    }
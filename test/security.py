@@ -1,6 +1,10 @@
 import ipaddress
 import re
-from typing import List, Optional
+import socket
+import struct
+from bisect import bisect_right
+from functools import lru_cache
+from typing import NamedTuple
 from urllib.parse import urlparse
 
 # Private IP ranges
@@ -9,35 +13,202 @@ PRIVATE_IP_RANGES = [
     ipaddress.ip_network("172.16.0.0/12"),
     ipaddress.ip_network("192.168.0.0/16"),
     ipaddress.ip_network("127.0.0.0/8"),
+    ipaddress.ip_network("169.254.0.0/16"),  # link-local, incl. cloud metadata
+    ipaddress.ip_network("0.0.0.0/8"),
     ipaddress.ip_network("::1/128"),
+    ipaddress.ip_network("::/128"),
+    ipaddress.ip_network("fc00::/7"),  # unique local
+    ipaddress.ip_network("fe80::/10"),  # link-local
 ]
 
 
-def is_private_ip(ip: str) -> bool:
+def _int_ranges(version: int) -> tuple[list[int], list[int]]:
+    # Sorted, non-overlapping (first, last) bounds as plain ints, split for bisect
+    bounds = sorted(
+        (int(net.network_address), int(net.broadcast_address))
+        for net in PRIVATE_IP_RANGES
+        if net.version == version
+    )
+    return [first for first, _ in bounds], [last for _, last in bounds]
+
+
+_PRIVATE_V4_FIRSTS, _PRIVATE_V4_LASTS = _int_ranges(4)
+_PRIVATE_V6_FIRSTS, _PRIVATE_V6_LASTS = _int_ranges(6)
+# Leading octets any private v4 range can start with; most public addresses stop here
+_PRIVATE_V4_FIRST_OCTETS = frozenset(
+    octet
+    for first, last in zip(_PRIVATE_V4_FIRSTS, _PRIVATE_V4_LASTS, strict=True)
+    for octet in range(first >> 24, (last >> 24) + 1)
+)
+_unpack_u32 = struct.Struct("!I").unpack
+
+
+def _in_ranges(value: int, firsts: list[int], lasts: list[int]) -> bool:
+    i = bisect_right(firsts, value) - 1
+    return i >= 0 and value <= lasts[i]
+
+
+def _is_private_v6(ip: str) -> bool:
+    if ip == "::1":
+        return True
     try:
-        ip_obj = ipaddress.ip_address(ip)
-        for network in PRIVATE_IP_RANGES:
-            if ip_obj in network:
-                return True
-        return False
+        ip_obj = ipaddress.IPv6Address(ip)
     except ValueError:
         return False
+    # ::ffff:a.b.c.d reaches the IPv4 host, so judge it by the v4 ranges
+    mapped = ip_obj.ipv4_mapped
+    if mapped is not None:
+        return _in_ranges(int(mapped), _PRIVATE_V4_FIRSTS, _PRIVATE_V4_LASTS)
+    return _in_ranges(int(ip_obj), _PRIVATE_V6_FIRSTS, _PRIVATE_V6_LASTS)
 
 
-def compile_allowed_patterns(allowed_domains: List[str]):
-    return [re.compile(pattern) for pattern in allowed_domains]
+# Resolvers hand back the same few addresses over and over; IPv6 parsing is the
+# expensive case and a hit skips it entirely
+@lru_cache(maxsize=4096)
+def is_private_ip(ip: str) -> bool:
+    # inet_pton rather than inet_aton: it rejects shorthand like "127.1"
+    try:
+        packed = socket.inet_pton(socket.AF_INET, ip)
+    except OSError:
+        return _is_private_v6(ip)
+    if packed[0] not in _PRIVATE_V4_FIRST_OCTETS:
+        return False
+    return _in_ranges(_unpack_u32(packed)[0], _PRIVATE_V4_FIRSTS, _PRIVATE_V4_LASTS)
 
 
-def is_domain_allowed(domain: str, allowed_patterns) -> bool:
-    if not allowed_patterns:
+def is_ip_literal(host: str) -> bool:
+    # Canonical forms only; shorthand like "127.1" is left to the resolver
+    for family in (socket.AF_INET, socket.AF_INET6):
+        try:
+            socket.inet_pton(family, host)
+        except OSError:
+            continue
         return True
-    for pattern in allowed_patterns:
-        if pattern.match(domain):
+    return False
+
+
+# Hostnames are case-insensitive; extract_domain already hands back lowercase
+def compile_allowed_patterns(allowed_domains: list[str]):
+    return [re.compile(pattern, re.IGNORECASE) for pattern in allowed_domains]
+
+
+# "^host\.example\.com$"-style entries with no other regex syntax
+_ANCHORED_LITERAL = re.compile(r"\^((?:[^.^$*+?{}\[\]\\|()]|\\[.-])+)\$")
+# Bare hostnames like "api.example.com" are exact matches, not regexes
+_PLAIN_ENTRY = re.compile(r"[A-Za-z0-9.-]+")
+# "*.example.com" entries allow any subdomain (but not example.com itself)
+_WILDCARD_ENTRY = re.compile(r"\*\.([A-Za-z0-9-]+(?:\.[A-Za-z0-9-]+)*)")
+# Marks a node whose reversed-label path is an allowed "*." suffix
+_TRIE_END = None
+
+
+class DomainMatcher(NamedTuple):
+    exact: frozenset[str]
+    # Reversed-label trie of "*." suffixes: {"com": {"example": {None: True}}}
+    suffixes: dict
+    regex: re.Pattern | None
+    # Only used when the entries cannot be fused into a single regex
+    patterns: list[re.Pattern]
+
+
+def is_valid_allowed_entry(entry: str) -> bool:
+    if entry.startswith("*."):
+        return _WILDCARD_ENTRY.fullmatch(entry) is not None
+    try:
+        re.compile(entry)
+    except re.error:
+        return False
+    return True
+
+
+def build_domain_matcher(allowed_domains: list[str]) -> DomainMatcher:
+    exact = set()
+    suffixes: dict = {}
+    regex_sources = []
+    for entry in allowed_domains:
+        wildcard = _WILDCARD_ENTRY.fullmatch(entry)
+        if wildcard:
+            node = suffixes
+            for label in reversed(wildcard.group(1).lower().split(".")):
+                node = node.setdefault(label, {})
+            node[_TRIE_END] = True
+            continue
+        if _PLAIN_ENTRY.fullmatch(entry):
+            exact.add(entry.lower())
+            continue
+        literal = _ANCHORED_LITERAL.fullmatch(entry)
+        if literal:
+            exact.add(literal.group(1).replace("\\", "").lower())
+        else:
+            # Already implied by IGNORECASE, and would stop the entries fusing
+            regex_sources.append(entry[4:] if entry.startswith("(?i)") else entry)
+    if not regex_sources:
+        return DomainMatcher(frozenset(exact), suffixes, None, [])
+    try:
+        fused = re.compile(
+            "|".join(f"(?:{p})" for p in regex_sources), re.IGNORECASE
+        )
+    except re.error:
+        # e.g. inline global flags, which are only valid at the start of a pattern
+        return DomainMatcher(
+            frozenset(exact), suffixes, None, compile_allowed_patterns(regex_sources)
+        )
+    return DomainMatcher(frozenset(exact), suffixes, fused, [])
+
+
+def _matches_suffix(suffixes: dict, domain: str) -> bool:
+    node = suffixes
+    labels = domain.split(".")
+    # Stop before the first label: "*." needs at least one label of its own
+    for i in range(len(labels) - 1, 0, -1):
+        node = node.get(labels[i])
+        if node is None:
+            return False
+        if _TRIE_END in node:
             return True
     return False
 
 
-def extract_domain(url: str) -> Optional[str]:
+def is_domain_allowed(domain: str, matcher: DomainMatcher) -> bool:
+    exact, suffixes, regex, patterns = matcher
+    if not exact and not suffixes and regex is None and not patterns:
+        return True
+    if domain in exact:
+        return True
+    if suffixes and _matches_suffix(suffixes, domain):
+        return True
+    if regex is not None:
+        return regex.match(domain) is not None
+    return any(pattern.match(domain) for pattern in patterns)
+
+
+# Hosts made only of these need no further parsing; anything else
+# (userinfo, IPv6 literals, escapes, whitespace) goes through urlparse
+_PLAIN_HOST_CHARS = frozenset("abcdefghijklmnopqrstuvwxyz0123456789.-")
+
+
+# Pure function of the URL; polling clients repeat the same targets
+@lru_cache(maxsize=4096)
+def extract_domain(url: str) -> str | None:
+    if url.startswith("https://"):
+        rest = url[8:]
+    elif url.startswith("http://"):
+        rest = url[7:]
+    else:
+        rest = url
+    end = len(rest)
+    for sep in "/?#":
+        i = rest.find(sep, 0, end)
+        if i >= 0:
+            end = i
+    authority = rest[:end]
+    host = authority.partition(":")[0].lower()
+    if host and "@" not in authority and _PLAIN_HOST_CHARS.issuperset(host):
+        return host
+    return _extract_domain_slow(url)
+
+
+def _extract_domain_slow(url: str) -> str | None:
     try:
         if not url.startswith(("http://", "https://")):
             url = "https://" + url
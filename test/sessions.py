@@ -0,0 +1,110 @@
+import logging
+import os
+import time
+from collections import OrderedDict
+
+try:
+    from redis import asyncio as aioredis
+    from redis.exceptions import ConnectionError as RedisConnectionError
+    from redis.exceptions import TimeoutError as RedisTimeoutError
+except ImportError:  # optional dependency, sessions stay in-process
+    aioredis = None
+
+SESSION_REDIS_URL_ENV = "ADMIN_SESSION_REDIS_URL"
+# Seconds to wait on the Redis server before using the in-process fallback
+REDIS_TIMEOUT = 1.0
+
+logger = logging.getLogger(__name__)
+
+
+class MemorySessionStore:
+    # token -> expiry epoch, oldest first; bounded to max_sessions entries
+    def __init__(self, max_sessions: int) -> None:
+        self._expiry: OrderedDict[str, float] = OrderedDict()
+        self._max_sessions = max_sessions
+
+    async def add(self, token: str, ttl: int) -> None:
+        now = time.time()
+        # Same TTL for every login, so expired entries are always at the front
+        while self._expiry and next(iter(self._expiry.values())) <= now:
+            self._expiry.popitem(last=False)
+        self._expiry[token] = now + ttl
+        self._expiry.move_to_end(token)
+        if len(self._expiry) > self._max_sessions:
+            self._expiry.popitem(last=False)
+
+    async def exists(self, token: str) -> bool:
+        expires = self._expiry.get(token)
+        if expires is None:
+            return False
+        if expires <= time.time():
+            del self._expiry[token]
+            return False
+        return True
+
+    async def discard(self, token: str) -> None:
+        self._expiry.pop(token, None)
+
+
+class RedisSessionStore:
+    # Shared across uvicorn workers; Redis expires the keys itself. While the
+    # server is unreachable, sessions go to the in-process fallback store
+    def __init__(self, client, fallback: MemorySessionStore) -> None:
+        self._redis = client
+        self._fallback = fallback
+        self._down = False
+
+    def _unavailable(self, exc: Exception) -> MemorySessionStore:
+        if not self._down:
+            self._down = True
+            logger.warning(
+                "Session Redis unreachable (%s); using in-process sessions", exc
+            )
+        return self._fallback
+
+    def _reachable(self) -> None:
+        if self._down:
+            self._down = False
+            logger.warning("Session Redis reachable again")
+
+    async def add(self, token: str, ttl: int) -> None:
+        try:
+            await self._redis.set(f"sess:{token}", "1", ex=ttl)
+        except (RedisConnectionError, RedisTimeoutError) as e:
+            await self._unavailable(e).add(token, ttl)
+            return
+        self._reachable()
+
+    async def exists(self, token: str) -> bool:
+        try:
+            found = bool(await self._redis.exists(f"sess:{token}"))
+        except (RedisConnectionError, RedisTimeoutError) as e:
+            return await self._unavailable(e).exists(token)
+        self._reachable()
+        # Logins made during an outage stay valid once the server is back
+        return found or await self._fallback.exists(token)
+
+    async def discard(self, token: str) -> None:
+        await self._fallback.discard(token)
+        try:
+            await self._redis.delete(f"sess:{token}")
+        except (RedisConnectionError, RedisTimeoutError) as e:
+            self._unavailable(e)
+            return
+        self._reachable()
+
+
+def create_session_store(max_sessions: int, url: str | None = None):
+    url = url or os.getenv(SESSION_REDIS_URL_ENV)
+    if url:
+        if aioredis is not None:
+            client = aioredis.from_url(
+                url, socket_connect_timeout=REDIS_TIMEOUT, socket_timeout=REDIS_TIMEOUT
+            )
+            return RedisSessionStore(client, MemorySessionStore(max_sessions))
+        logger.warning(
+            "%s is set but redis is not installed; admin sessions stay "
+            "in-process and are not shared between workers",
+            SESSION_REDIS_URL_ENV,
+        )
+    return MemorySessionStore(max_sessions)
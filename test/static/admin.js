@@ -0,0 +1,25 @@
+const chartData={up:[],down:[]};
+function appendRate(up_bps,down_bps){const upKB=up_bps/1024,downKB=down_bps/1024;chartData.up.push(upKB);chartData.down.push(downKB);if(chartData.up.length>60){chartData.up.shift();chartData.down.shift();}drawRate();}
+function drawRate(){const c=document.getElementById('rateChart');if(!c)return;const ctx=c.getContext('2d');const W=c.width,H=c.height;ctx.clearRect(0,0,W,H);ctx.font='10px Arial';ctx.fillStyle='#555';ctx.fillText('上行(KB/s)',6,12);ctx.fillText('下行(KB/s)',6,24);const max=Math.max(...chartData.up,...chartData.down,1);const pad=30;function line(arr,color){ctx.beginPath();ctx.strokeStyle=color;arr.forEach((v,i)=>{const x=pad+(W-pad-5)*(i/(arr.length-1||1));const y=H-10-(H-pad-10)*(v/max);i?ctx.lineTo(x,y):ctx.moveTo(x,y);});ctx.stroke();}
+ctx.strokeStyle='#eee';for(let i=0;i<5;i++){const y=H-10-(H-pad-10)*(i/4);ctx.beginPath();ctx.moveTo(pad,y);ctx.lineTo(W-5,y);ctx.stroke();}
+line(chartData.up,'#2563eb');line(chartData.down,'#16a34a');ctx.fillStyle='#333';ctx.fillText('max '+max.toFixed(1)+' KB/s',W-100,12);}
+function fmtBytes(b){if(!b)return'0 B';const k=1024,s=['B','KB','MB','GB','TB'];const i=Math.floor(Math.log(b)/Math.log(k));const v=b/Math.pow(k,i);return v.toFixed(v>=100?0:v>=10?1:2)+' '+s[i];}
+function fmtKBps(bps){return (bps/1024).toFixed(bps>=102400?0:bps>=10240?1:2)+' KB/s';}
+function renderMetrics(m){document.getElementById('totals').innerHTML='上行: <strong>'+fmtBytes(m.total_up_bytes)+'</strong><br>下行: <strong>'+fmtBytes(m.total_down_bytes)+'</strong><br>总计: <strong>'+fmtBytes(m.total_bytes)+'</strong><br>请求数: <strong>'+m.total_requests+'</strong>';document.getElementById('rates').innerHTML='上行速率: '+fmtKBps(m.rates.up_bps)+' | 下行速率: '+fmtKBps(m.rates.down_bps)+' (窗口 '+m.window_seconds+'s)';document.getElementById('uptime').innerHTML='运行时间: '+Math.floor(m.uptime_seconds)+' 秒';appendRate(m.rates.up_bps,m.rates.down_bps);const tbody=document.querySelector('#domainTable tbody');const entries=Object.entries(m.domain_stats);if(!entries.length){tbody.innerHTML='<tr><td colspan="5"><em>暂无数据</em></td></tr>';return;}tbody.innerHTML=entries.map(([d,st])=>'<tr><td>'+d+'</td><td>'+st.requests+'</td><td>'+fmtBytes(st.up_bytes)+'</td><td>'+fmtBytes(st.down_bytes)+'</td><td>'+fmtBytes(st.up_bytes+st.down_bytes)+'</td></tr>').join('');}
+// Unsaved edits in the rate limit form; polling leaves the inputs alone until saved
+let rlDirty=false;
+function fillRateLimitForm(c){const f=document.getElementById('rateLimitForm');if(rlDirty||(f&&f.contains(document.activeElement)))return;document.getElementById('rl_enabled').checked = !!c.enabled;document.getElementById('rl_window').value = c.window_seconds;document.getElementById('rl_ip').value = c.max_requests_per_ip || '';document.getElementById('rl_dom').value = c.max_requests_per_domain || '';}
+function renderRateLimit(data){const c = data.config; const u = data.usage;fillRateLimitForm(c);let html = '<div>状态: '+(c.enabled?'启用':'关闭')+'</div>';if(c.enabled){html += '<div>窗口: '+c.window_seconds+'s 剩余: '+(u.reset_epoch - Math.floor(Date.now()/1000))+'s</div>';}document.getElementById('rateLimitPanel').innerHTML = html;}
+async function loadAll(){const r=await fetch('/admin/bootstrap');if(!r.ok){document.getElementById('rateLimitPanel').innerHTML='<em>无法获取</em>';return;}const data=await r.json();renderMetrics(data.traffic);renderRateLimit(data.rate_limit);}
+function esc(s){return String(s).replace(/[&<>"']/g,c=>({'&':'&amp;','<':'&lt;','>':'&gt;','"':'&quot;',"'":'&#39;'})[c]);}
+function refreshAllowed(list){const ul=document.querySelector('ul');ul.innerHTML=list.map(d=>'<li><code>'+esc(d)+'</code></li>').join('')||'<li><em>未配置</em></li>'}
+function rlLimit(id){const v=parseInt(document.getElementById(id).value,10);return v>0?v:null;}
+async function saveRateLimit(e){e.preventDefault();const body={enabled:document.getElementById('rl_enabled').checked,window_seconds:parseInt(document.getElementById('rl_window').value,10),max_requests_per_ip:rlLimit('rl_ip'),max_requests_per_domain:rlLimit('rl_dom')};const r=await fetch('/admin/rate_limit/update',{method:'POST',headers:{'Content-Type':'application/json'},body:JSON.stringify(body)});if(r.ok){const data=await r.json();rlDirty=false;document.activeElement&&document.activeElement.blur();renderRateLimit(data);}}
+async function addDomain(){const v=document.getElementById('domainInput').value.trim();if(!v)return;const r=await fetch('/admin/domains/add',{method:'POST',headers:{'Content-Type':'application/json'},body:JSON.stringify({d:v})});if(r.ok){const data=await r.json();refreshAllowed(data.domains);document.getElementById('domainInput').value='';}}
+async function delDomain(){const v=document.getElementById('domainInput').value.trim();if(!v)return;const r=await fetch('/admin/domains/remove',{method:'POST',headers:{'Content-Type':'application/json'},body:JSON.stringify({d:v})});if(r.ok){const data=await r.json();refreshAllowed(data.domains);document.getElementById('domainInput').value='';}}
+// Single scheduler: poll every 2s while the tab is visible, never overlapping fetches
+let lastPoll=-Infinity,polling=false;
+function tick(now){if(!document.hidden&&!polling&&now-lastPoll>=2000){lastPoll=now;polling=true;loadAll().finally(()=>{polling=false;});}requestAnimationFrame(tick);}
+requestAnimationFrame(tick);
+// Bind buttons after DOM ready
+setTimeout(()=>{const a=document.getElementById('addDomainBtn');const d=document.getElementById('delDomainBtn');a&& (a.onclick=addDomain);d&& (d.onclick=delDomain);const f=document.getElementById('rateLimitForm');f&&(f.oninput=()=>{rlDirty=true;},f.onsubmit=saveRateLimit);},0);
@@ -0,0 +1,3 @@
+async function doLogin(e){e.preventDefault();const k=document.getElementById('apiKeyInput').value.trim();if(!k){setMsg('请输入密码','err');return;}const r=await fetch('/admin/login',{method:'POST',headers:{'Content-Type':'application/json'},body:JSON.stringify({key:k})});if(r.status===200){setMsg('登录成功','ok');setTimeout(()=>{location.href='/admin';},400);}else{setMsg('登录失败 ('+r.status+')','err');}}
+function setMsg(t,c){const el=document.getElementById('msg');el.className='msg '+(c||'');el.textContent=t;}
+document.getElementById('loginForm').addEventListener('submit',doLogin);
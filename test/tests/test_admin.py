@@ -0,0 +1,84 @@
+import os
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+
+# Add the parent directory to the path so we can import main
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, parent_dir)
+
+import admin  # noqa: E402
+from main import app  # noqa: E402
+
+
+@pytest.fixture
+def anon_client():
+    return TestClient(app)
+
+
+@pytest.fixture
+def admin_client():
+    client = TestClient(app)
+    response = client.post("/admin/login", json={"key": admin.ADMIN_PASSWORD})
+    assert response.status_code == 200
+    return client
+
+
+@pytest.mark.parametrize(
+    "method, path",
+    [
+        ("get", "/admin/rate_limit"),
+        ("post", "/admin/rate_limit/update"),
+    ],
+)
+def test_rate_limit_endpoints_require_login(anon_client, method, path):
+    response = getattr(anon_client, method)(path)
+    assert response.status_code == 401
+
+
+def test_rate_limit_update_rejects_invalid_json(admin_client):
+    response = admin_client.post("/admin/rate_limit/update", content=b"{not json")
+    assert response.status_code == 400
+
+
+def test_rate_limit_update_authenticated(admin_client):
+    response = admin_client.post(
+        "/admin/rate_limit/update", json={"window_seconds": 30}
+    )
+    assert response.status_code == 200
+    assert response.json()["config"]["window_seconds"] == 30
+    admin_client.post("/admin/rate_limit/update", json={"window_seconds": 60})
+
+
+def test_login_page_revalidates_with_304(anon_client):
+    etag = anon_client.get("/admin/login").headers["etag"]
+    for header in (etag, f'"other", {etag}', etag.removeprefix("W/"), "*"):
+        response = anon_client.get("/admin/login", headers={"If-None-Match": header})
+        assert response.status_code == 304
+        assert response.headers["etag"] == etag
+
+
+def test_login_page_partial_etag_is_not_a_match(anon_client):
+    etag = anon_client.get("/admin/login").headers["etag"]
+    partial = etag[:-3] + '"'
+    response = anon_client.get("/admin/login", headers={"If-None-Match": partial})
+    assert response.status_code == 200
+
+
+def test_admin_page_redirects_to_login(anon_client):
+    response = anon_client.get("/admin", follow_redirects=False)
+    assert response.status_code == 302
+    assert response.headers["location"] == "/admin/login"
+
+
+@pytest.mark.parametrize("path", ["/admin/domains/add", "/admin/domains/remove"])
+def test_domain_endpoints_check_login_before_body(anon_client, path):
+    response = anon_client.post(path, content=b"{not json")
+    assert response.status_code == 401
+
+
+@pytest.mark.parametrize("body", [b"{not json", b'{"d": 1}'])
+def test_domain_add_rejects_invalid_body(admin_client, body):
+    response = admin_client.post("/admin/domains/add", content=body)
+    assert response.status_code == 400
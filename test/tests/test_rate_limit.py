@@ -0,0 +1,180 @@
+import os
+import socket
+import sys
+from unittest.mock import patch
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+# Add the parent directory to the path so we can import rate_limit
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, parent_dir)
+
+import proxy  # noqa: E402
+import rate_limit  # noqa: E402
+from main import app  # noqa: E402
+
+WINDOW = 60
+# Start of a window, so offsets below read as seconds into it
+T0 = 100 * WINDOW
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [float(T0)]
+    monkeypatch.setattr(rate_limit.time, "time", lambda: now[0])
+    return now
+
+
+@pytest.fixture(autouse=True)
+async def limiter(monkeypatch):
+    monkeypatch.setattr(rate_limit, "_window_id", -1)
+    for name in ("_ip_counts", "_prev_ip_counts"):
+        monkeypatch.setattr(rate_limit, name, rate_limit._BoundedCounts(4))
+    for name in ("_domain_counts", "_prev_domain_counts"):
+        monkeypatch.setattr(rate_limit, name, rate_limit._BoundedCounts(4))
+    previous = await rate_limit.get_rate_limit_config()
+    await rate_limit.update_rate_limit_config(
+        enabled=True,
+        window_seconds=WINDOW,
+        max_requests_per_ip=10,
+        max_requests_per_domain=None,
+    )
+    yield
+    previous.pop("reset_epoch")
+    await rate_limit.update_rate_limit_config(**previous)
+
+
+async def _hit(n, ip="1.2.3.4", domain="example.com"):
+    return [await rate_limit.check_and_increment(ip, domain) for _ in range(n)]
+
+
+async def test_limit_within_one_window(clock):
+    clock[0] = T0 + 30
+    results = await _hit(11)
+    assert [allowed for allowed, _ in results] == [True] * 10 + [False]
+    assert [meta["remaining_ip"] for _, meta in results[:3]] == [9, 8, 7]
+    assert results[-1][1]["remaining_ip"] == 0
+    assert results[-1][1]["reset"] == T0 + WINDOW
+
+
+async def test_previous_window_is_weighted_by_its_remaining_overlap(clock):
+    clock[0] = T0 + 30
+    await _hit(10)
+
+    # 15s into the next window, 3/4 of the previous one is still covered:
+    # 10 * 0.75 = 7.5 requests carry over
+    clock[0] = T0 + WINDOW + 15
+    results = await _hit(4)
+    assert [allowed for allowed, _ in results] == [True, True, True, False]
+    assert [meta["remaining_ip"] for _, meta in results] == [1, 0, 0, 0]
+
+    # 45s in, only a quarter remains: 3 + 10 * 0.25 = 5.5 used
+    clock[0] = T0 + WINDOW + 45
+    allowed, meta = await rate_limit.check_and_increment("1.2.3.4", "example.com")
+    assert allowed
+    assert meta["remaining_ip"] == 3
+
+
+async def test_idle_window_clears_history(clock):
+    clock[0] = T0 + 30
+    await _hit(10)
+    # Skipping a whole window means nothing carries over
+    clock[0] = T0 + 2 * WINDOW + 1
+    allowed, meta = await rate_limit.check_and_increment("1.2.3.4", "example.com")
+    assert allowed
+    assert meta["remaining_ip"] == 9
+
+
+async def test_rejected_request_is_written_back(clock):
+    await _hit(10, ip="a")
+    await _hit(1, ip="b")
+    allowed, _ = await rate_limit.check_and_increment("a", "example.com")
+    assert not allowed
+    # Rejection does not consume quota but still marks "a" as most recent
+    assert list(rate_limit._ip_counts.items()) == [("b", 1), ("a", 10)]
+    assert rate_limit._domain_counts["example.com"] == 11
+
+
+def test_bounded_counts_missing_key_reads_zero_without_insert():
+    counts = rate_limit._BoundedCounts(2)
+    assert counts["absent"] == 0
+    assert "absent" not in counts
+    assert len(counts) == 0
+
+
+def test_bounded_counts_evicts_least_recently_set():
+    counts = rate_limit._BoundedCounts(2)
+    counts["a"] = 1
+    counts["b"] = 1
+    counts["a"] = 2  # refreshes "a", so "b" is now the oldest
+    counts["c"] = 1
+    assert list(counts.items()) == [("a", 2), ("c", 1)]
+
+
+async def test_flood_of_new_ips_is_bounded(clock):
+    for i in range(10):
+        await rate_limit.check_and_increment(f"10.0.0.{i}", "example.com")
+    assert list(rate_limit._ip_counts) == [f"10.0.0.{i}" for i in range(6, 10)]
+
+
+def test_apply_rate_limit_headers():
+    headers = {}
+    meta = {
+        "enabled": True,
+        "limit_ip": 10,
+        "remaining_ip": 4,
+        "limit_domain": None,
+        "remaining_domain": None,
+        "reset": T0 + WINDOW,
+    }
+    rate_limit.apply_rate_limit_headers(headers, meta)
+    assert headers == {
+        "X-RateLimit-Limit-IP": "10",
+        "X-RateLimit-Remaining-IP": "4",
+        "X-RateLimit-Limit-Domain": "None",
+        "X-RateLimit-Remaining-Domain": "None",
+        "X-RateLimit-Reset": str(T0 + WINDOW),
+    }
+
+
+def test_apply_rate_limit_headers_disabled():
+    headers = {}
+    rate_limit.apply_rate_limit_headers(headers, rate_limit._DISABLED_META)
+    assert headers == {}
+
+
+async def test_proxy_rejects_over_limit_with_429(clock, monkeypatch):
+    monkeypatch.setattr(proxy, "aiodns", None)
+    proxy._dns_cache.clear()
+    await rate_limit.update_rate_limit_config(
+        max_requests_per_ip=2, max_requests_per_domain=5
+    )
+    clock[0] = T0 + 30
+    client = TestClient(app)
+    addrinfo = [(socket.AF_INET, socket.SOCK_STREAM, 6, "", ("93.184.216.34", 0))]
+    with patch("httpx.AsyncClient.send") as mock_send, patch(
+        "socket.getaddrinfo", return_value=addrinfo
+    ):
+        mock_send.side_effect = lambda *a, **k: httpx.Response(
+            200, stream=httpx.ByteStream(b"ok")
+        )
+        responses = [client.get("/proxy/example.com") for _ in range(3)]
+
+    assert [r.status_code for r in responses] == [200, 200, 429]
+    first, second, rejected = responses
+    assert first.headers["X-RateLimit-Limit-IP"] == "2"
+    assert first.headers["X-RateLimit-Remaining-IP"] == "1"
+    assert first.headers["X-RateLimit-Limit-Domain"] == "5"
+    assert first.headers["X-RateLimit-Remaining-Domain"] == "4"
+    assert first.headers["X-RateLimit-Reset"] == str(T0 + WINDOW)
+    assert second.headers["X-RateLimit-Remaining-IP"] == "0"
+    assert rejected.json() == {"detail": "Rate limit exceeded"}
+    assert mock_send.call_count == 2
+
+
+def test_old_interface_is_importable_from_proxy():
+    assert proxy.get_rate_limit_config is rate_limit.get_rate_limit_config
+    assert proxy.update_rate_limit_config is rate_limit.update_rate_limit_config
+    assert proxy.get_window_usage is rate_limit.get_window_usage
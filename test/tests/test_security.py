@@ -0,0 +1,106 @@
+import os
+import sys
+
+import pytest
+
+# Add the parent directory to the path so we can import security
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, parent_dir)
+
+from security import (  # noqa: E402
+    build_domain_matcher,
+    is_domain_allowed,
+    is_private_ip,
+    is_valid_allowed_entry,
+)
+
+
+@pytest.mark.parametrize(
+    "entries, domain, allowed",
+    [
+        # Empty list allows everything
+        ([], "anything.example", True),
+        # Wildcard: any subdomain, but not the apex
+        (["*.example.com"], "api.example.com", True),
+        (["*.example.com"], "a.b.example.com", True),
+        (["*.example.com"], "example.com", False),
+        (["*.example.com"], "badexample.com", False),
+        # Anchored literal becomes an exact match
+        ([r"^api\.example\.com$"], "api.example.com", True),
+        ([r"^api\.example\.com$"], "apixexample.com", False),
+        ([r"^api\.example\.com$"], "v2.api.example.com", False),
+        # Bare host is exact, its dots are not regex wildcards
+        (["api.example.com"], "api.example.com", True),
+        (["api.example.com"], "apixexample.com", False),
+        (["api.example.com"], "sub.api.example.com", False),
+        # Mixed case entries match the lowercase hosts extract_domain returns
+        (["API.Example.COM"], "api.example.com", True),
+        (["*.Example.COM"], "api.example.com", True),
+        ([r"^API\.Example\.com$"], "api.example.com", True),
+        ([r"^.*\.Example\.org$"], "cdn.example.org", True),
+        # General regexes are fused and matched from the start
+        ([r"^.*\.example\.org$", "*.example.com"], "cdn.example.org", True),
+        ([r"^.*\.example\.org$", "*.example.com"], "example.net", False),
+        ([r"(?i)^cdn\d+\.example\.net$"], "cdn7.example.net", True),
+    ],
+)
+def test_is_domain_allowed(entries, domain, allowed):
+    assert is_domain_allowed(domain, build_domain_matcher(entries)) is allowed
+
+
+def test_unfusable_patterns_fall_back_to_per_pattern_matching():
+    # A global inline flag is only valid at the start of a pattern, so these
+    # compile alone but not as one alternation
+    entries = [r"^a\d\.example\.com$", r"(?s)^b\d\.example\.com$"]
+    matcher = build_domain_matcher(entries)
+    assert matcher.regex is None
+    assert len(matcher.patterns) == 2
+    assert is_domain_allowed("a1.example.com", matcher)
+    assert is_domain_allowed("B2.example.com", matcher)
+    assert not is_domain_allowed("c3.example.com", matcher)
+
+
+@pytest.mark.parametrize(
+    "entry, valid",
+    [
+        ("*.example.com", True),
+        ("*.", False),
+        ("*example.com", False),
+        (r"^api\.example\.com$", True),
+        ("example.com", True),
+        ("([unclosed", False),
+    ],
+)
+def test_is_valid_allowed_entry(entry, valid):
+    assert is_valid_allowed_entry(entry) is valid
+
+
+@pytest.mark.parametrize(
+    "ip, private",
+    [
+        ("10.1.2.3", True),
+        ("172.16.0.1", True),
+        ("172.32.0.1", False),
+        ("192.168.1.1", True),
+        ("127.0.0.1", True),
+        ("169.254.169.254", True),
+        ("169.255.0.1", False),
+        ("0.0.0.0", True),
+        ("0.255.255.255", True),
+        ("1.0.0.0", False),
+        ("93.184.216.34", False),
+        ("::1", True),
+        ("::", True),
+        ("fc00::1", True),
+        ("fdff:ffff::1", True),
+        ("fe80::1", True),
+        ("febf::1", True),
+        ("fec0::1", False),
+        ("::ffff:127.0.0.1", True),
+        ("::ffff:10.0.0.1", True),
+        ("::ffff:93.184.216.34", False),
+        ("2606:2800:220:1::1", False),
+    ],
+)
+def test_is_private_ip(ip, private):
+    assert is_private_ip(ip) is private
@@ -0,0 +1,119 @@
+import asyncio
+import logging
+import os
+import sys
+
+import pytest
+
+# Add the parent directory to the path so we can import sessions
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, parent_dir)
+
+import sessions  # noqa: E402
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(sessions.time, "time", lambda: now[0])
+    return now
+
+
+async def test_memory_session_expires(clock):
+    store = sessions.MemorySessionStore(8)
+    await store.add("a", 10)
+    assert await store.exists("a")
+    clock[0] += 10
+    assert not await store.exists("a")
+    assert "a" not in store._expiry
+
+
+async def test_memory_add_purges_expired_sessions(clock):
+    store = sessions.MemorySessionStore(8)
+    await store.add("old", 10)
+    clock[0] += 5
+    await store.add("newer", 10)
+    clock[0] += 5
+    await store.add("fresh", 10)
+    assert list(store._expiry) == ["newer", "fresh"]
+
+
+async def test_memory_store_evicts_oldest_over_capacity(clock):
+    store = sessions.MemorySessionStore(2)
+    for token in ("a", "b", "c"):
+        await store.add(token, 60)
+    assert not await store.exists("a")
+    assert await store.exists("b")
+    assert await store.exists("c")
+
+
+async def test_memory_discard(clock):
+    store = sessions.MemorySessionStore(8)
+    await store.add("a", 60)
+    await store.discard("a")
+    await store.discard("missing")
+    assert not await store.exists("a")
+
+
+@pytest.fixture
+def redis_server():
+    fakeredis = pytest.importorskip("fakeredis")
+    return fakeredis.FakeServer()
+
+
+@pytest.fixture
+def redis_store(redis_server):
+    fakeredis = pytest.importorskip("fakeredis")
+    client = fakeredis.FakeAsyncRedis(server=redis_server)
+    return sessions.RedisSessionStore(client, sessions.MemorySessionStore(8))
+
+
+async def test_redis_session_has_ttl(redis_store):
+    await redis_store.add("a", 30)
+    assert await redis_store.exists("a")
+    assert 0 < await redis_store._redis.ttl("sess:a") <= 30
+
+
+async def test_redis_session_expires(redis_store):
+    await redis_store.add("a", 30)
+    await redis_store._redis.pexpire("sess:a", 1)
+    await asyncio.sleep(0.01)
+    assert not await redis_store.exists("a")
+    await redis_store.discard("a")
+
+
+def test_redis_url_without_redis_warns(monkeypatch, caplog):
+    monkeypatch.setattr(sessions, "aioredis", None)
+    with caplog.at_level(logging.WARNING, logger=sessions.__name__):
+        store = sessions.create_session_store(4, "redis://localhost:6379/0")
+    assert isinstance(store, sessions.MemorySessionStore)
+    assert sessions.SESSION_REDIS_URL_ENV in caplog.text
+
+
+async def test_redis_outage_falls_back_to_memory(redis_server, redis_store, caplog):
+    redis_server.connected = False
+    with caplog.at_level(logging.WARNING, logger=sessions.__name__):
+        await redis_store.add("a", 30)
+        assert await redis_store.exists("a")
+    assert "unreachable" in caplog.text
+    await redis_store.discard("a")
+    assert not await redis_store.exists("a")
+
+
+async def test_outage_sessions_survive_recovery(redis_server, redis_store):
+    redis_server.connected = False
+    await redis_store.add("during", 30)
+    redis_server.connected = True
+    await redis_store.add("after", 30)
+    assert await redis_store.exists("during")
+    assert await redis_store.exists("after")
+    assert await redis_store._redis.exists("sess:after")
+    assert not await redis_store._redis.exists("sess:during")
+
+
+async def test_unreachable_redis_url_still_accepts_logins():
+    pytest.importorskip("redis")
+    # Nothing listens on port 1, so every call is refused at once
+    store = sessions.create_session_store(4, "redis://127.0.0.1:1/0")
+    await store.add("a", 30)
+    assert await store.exists("a")
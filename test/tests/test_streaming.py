@@ -0,0 +1,90 @@
+import os
+import socket
+import sys
+from unittest.mock import patch
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+# Add the parent directory to the path so we can import main
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, parent_dir)
+
+import proxy  # noqa: E402
+from main import app  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def clear_dns_cache(monkeypatch):
+    monkeypatch.setattr(proxy, "aiodns", None)
+    proxy._dns_cache.clear()
+
+
+@pytest.fixture
+def recorded(monkeypatch):
+    calls = []
+    monkeypatch.setattr(
+        proxy, "record_request", lambda *args: calls.append(args)
+    )
+    return calls
+
+
+class _ChunkStream(httpx.AsyncByteStream):
+    def __init__(self, chunks):
+        self._chunks = chunks
+        self.closed = False
+
+    async def __aiter__(self):
+        for chunk in self._chunks:
+            yield chunk
+
+    async def aclose(self):
+        self.closed = True
+
+
+def _addrinfo(ip):
+    return [(socket.AF_INET, socket.SOCK_STREAM, 6, "", (ip, 0))]
+
+
+def _get(stream, **client_kwargs):
+    client = TestClient(app, **client_kwargs)
+    with patch("httpx.AsyncClient.send") as mock_send, patch(
+        "socket.getaddrinfo", return_value=_addrinfo("93.184.216.34")
+    ):
+        mock_send.return_value = httpx.Response(200, stream=stream)
+        return client.get("/proxy/example.com")
+
+
+def test_streamed_response_is_recorded(recorded):
+    stream = _ChunkStream([b"abc", b"def"])
+    response = _get(stream)
+    assert response.content == b"abcdef"
+    assert stream.closed
+    assert recorded == [("example.com", "GET", 0, 6)]
+
+
+def test_oversized_stream_is_cut_off_and_recorded(monkeypatch, recorded):
+    monkeypatch.setattr(proxy, "MAX_RESPONSE_SIZE", 8)
+    stream = _ChunkStream([b"aaaa", b"bbbb", b"cccc", b"dddd"])
+    with pytest.raises(RuntimeError, match="size limit"):
+        _get(stream)
+    assert stream.closed
+    # Only the chunks relayed before the cap count towards the transfer
+    assert recorded == [("example.com", "GET", 0, 8)]
+
+
+def test_oversized_content_length_returns_413(monkeypatch, recorded):
+    monkeypatch.setattr(proxy, "MAX_RESPONSE_SIZE", 8)
+    stream = _ChunkStream([b"0123456789"])
+    client = TestClient(app)
+    with patch("httpx.AsyncClient.send") as mock_send, patch(
+        "socket.getaddrinfo", return_value=_addrinfo("93.184.216.34")
+    ):
+        mock_send.return_value = httpx.Response(
+            200, headers={"content-length": "10"}, stream=stream
+        )
+        response = client.get("/proxy/example.com")
+    assert response.status_code == 413
+    assert stream.closed
+    assert recorded == []
@@ -0,0 +1,140 @@
+import os
+import socket
+import sys
+from unittest.mock import patch
+
+import httpcore
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+# Add the parent directory to the path so we can import main
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, parent_dir)
+
+import proxy  # noqa: E402
+from main import app  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def clear_dns_cache(monkeypatch):
+    monkeypatch.setattr(proxy, "aiodns", None)
+    proxy._dns_cache.clear()
+
+
+def _addrinfo(*ips):
+    return [(socket.AF_INET, socket.SOCK_STREAM, 6, "", (ip, 0)) for ip in ips]
+
+
+class _FakeBackend(httpcore.AsyncNetworkBackend):
+    # Fails the listed addresses with the given error, connects to the rest
+    def __init__(self, failures):
+        self.failures = failures
+        self.attempts = []
+
+    async def connect_tcp(self, host, port, **kwargs):
+        self.attempts.append(host)
+        if host in self.failures:
+            raise self.failures[host]
+        return host
+
+
+@pytest.mark.parametrize("error", [httpcore.ConnectError, httpcore.ConnectTimeout])
+async def test_backend_falls_through_to_next_address(error):
+    backend = _FakeBackend({"93.184.216.34": error("down")})
+    with patch(
+        "socket.getaddrinfo", return_value=_addrinfo("93.184.216.34", "93.184.216.35")
+    ):
+        stream = await proxy._VettedBackend(backend).connect_tcp("example.com", 443)
+    assert stream == "93.184.216.35"
+    assert backend.attempts == ["93.184.216.34", "93.184.216.35"]
+
+
+async def test_backend_raises_last_error_when_no_address_connects():
+    backend = _FakeBackend({
+        "93.184.216.34": httpcore.ConnectError("refused"),
+        "93.184.216.35": httpcore.ConnectTimeout("timed out"),
+    })
+    with patch(
+        "socket.getaddrinfo", return_value=_addrinfo("93.184.216.34", "93.184.216.35")
+    ), pytest.raises(httpcore.ConnectTimeout):
+        await proxy._VettedBackend(backend).connect_tcp("example.com", 443)
+
+
+async def test_backend_refuses_private_answer():
+    backend = _FakeBackend({})
+    with patch(
+        "socket.getaddrinfo", return_value=_addrinfo("93.184.216.34", "10.0.0.1")
+    ), pytest.raises(proxy.PrivateAddressError):
+        await proxy._VettedBackend(backend).connect_tcp("example.com", 443)
+    assert backend.attempts == []
+
+
+@pytest.fixture(params=["httpx", "aiohttp"])
+async def upstream_client(request, monkeypatch):
+    if request.param == "aiohttp":
+        if proxy.AiohttpTransport is None:
+            pytest.skip("httpx-aiohttp is not installed")
+        monkeypatch.setenv(proxy.UPSTREAM_TRANSPORT_ENV, "aiohttp")
+    else:
+        monkeypatch.delenv(proxy.UPSTREAM_TRANSPORT_ENV, raising=False)
+    monkeypatch.setattr(proxy, "_http_client", None)
+    yield proxy.get_http_client()
+    await proxy.close_http_client()
+
+
+async def test_rebinding_to_private_address_is_refused(upstream_client, monkeypatch):
+    # Every lookup misses the cache, so the connect resolves again
+    monkeypatch.setattr(proxy, "DNS_CACHE_TTL", 0)
+    with patch(
+        "socket.getaddrinfo",
+        side_effect=[_addrinfo("93.184.216.34"), _addrinfo("127.0.0.1")],
+    ):
+        ip, private = await proxy.resolve_host("rebind.example")
+        assert (ip, private) == ("93.184.216.34", False)
+        with pytest.raises(proxy.PrivateAddressError):
+            await upstream_client.get("http://rebind.example/")
+
+
+def test_private_address_at_connect_time_returns_403():
+    client = TestClient(app)
+    with patch("httpx.AsyncClient.send") as mock_send, patch(
+        "socket.getaddrinfo", return_value=_addrinfo("93.184.216.34")
+    ):
+        mock_send.side_effect = proxy.PrivateAddressError(
+            "example.com resolves to a private address"
+        )
+        response = client.get("/proxy/example.com")
+    assert response.status_code == 403
+
+
+@pytest.fixture
+def vetted_transport(monkeypatch):
+    def make(network_backend):
+        monkeypatch.setattr(httpcore, "AnyIOBackend", lambda: network_backend)
+        return proxy._VettedTransport(proxy.UPSTREAM_LIMITS)
+
+    return make
+
+
+async def test_transport_relays_response(vetted_transport):
+    backend = httpcore.AsyncMockBackend(
+        [b"HTTP/1.1 200 OK\r\n", b"Content-Length: 2\r\n", b"\r\n", b"ok"]
+    )
+    transport = vetted_transport(backend)
+    async with httpx.AsyncClient(transport=transport) as client:
+        with patch("socket.getaddrinfo", return_value=_addrinfo("93.184.216.34")):
+            response = await client.get("http://example.com/")
+    assert response.status_code == 200
+    assert response.content == b"ok"
+
+
+async def test_transport_maps_httpcore_errors(vetted_transport):
+    transport = vetted_transport(
+        _FakeBackend({"93.184.216.34": httpcore.ConnectTimeout("timed out")})
+    )
+    async with httpx.AsyncClient(transport=transport) as client:
+        with patch(
+            "socket.getaddrinfo", return_value=_addrinfo("93.184.216.34")
+        ), pytest.raises(httpx.ConnectTimeout):
+            await client.get("http://example.com/")